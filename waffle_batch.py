@@ -0,0 +1,145 @@
+# Batch solve mode for back-testing on archives of puzzles
+# Reads one puzzle per line of JSON and writes one result per line of JSON, solving across
+# a pool of processes that each load the compiled dictionary once
+#
+# A puzzle is either in the same shape as waffle_override.json (puzzle and solution as
+# 21 letters, rows top to bottom; the colors are worked out from the solution unless a
+# colors list is given) or a list of tiles as [letter, x, y, index, color]
+#
+#   python waffle_batch.py puzzles.jsonl -o results.jsonl --workers 8
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from waffle_colors import puzzle_colors
+from waffle_db import SolutionDB
+from waffle_search import words_to_board
+from waffle_solver import TILE_INDEXES, BOARD_SIZE, NUM_TILES, TileTuple, WaffleSolver, tiles_from_puzzle
+from waffle_words import WORDS_PATH, load_word_matrix
+
+# solver of the worker process, built once by init_worker
+solver : Optional[WaffleSolver] = None
+
+
+def init_worker(words_path : str, db_path : Optional[str] = None) -> None:
+  global solver
+  word_matrix = load_word_matrix(words_path)
+  solution_db = SolutionDB(db_path, word_matrix, words_path) if db_path else None
+  solver = WaffleSolver(word_matrix, solution_db=solution_db)
+
+
+# the tiles of a puzzle and its solution letters as a board, if it came with one
+def parse_puzzle(puzzle : Dict) -> Tuple[List[TileTuple], Optional[List[Optional[str]]]]:
+  if isinstance(puzzle, list):
+    puzzle = {'tiles': puzzle}
+
+  solution : Optional[List[Optional[str]]] = None
+  if 'solution' in puzzle:
+    if len(puzzle['solution']) != NUM_TILES:
+      raise ValueError('solution needs {} letters, got {}'.format(NUM_TILES, len(puzzle['solution'])))
+    solution = [None] * (BOARD_SIZE * BOARD_SIZE)
+    for letter, idx in zip(puzzle['solution'], TILE_INDEXES):
+      solution[idx] = letter.upper()
+
+  if 'tiles' in puzzle:
+    tiles = [(letter.upper(), x, y, index, color) for letter, x, y, index, color in puzzle['tiles']]
+    # every tile space exactly once, Board would fail on anything else
+    if sorted(t[3] for t in tiles) != TILE_INDEXES:
+      raise ValueError('tiles need to cover each of the {} tile spaces once'.format(NUM_TILES))
+    return tiles, solution
+
+  letters = [letter.upper() for letter in puzzle['puzzle']]
+  colors = puzzle.get('colors')
+  if colors is None:
+    if solution is None:
+      raise ValueError('puzzle needs either colors or a solution')
+    board : List[Optional[str]] = [None] * (BOARD_SIZE * BOARD_SIZE)
+    for letter, idx in zip(letters, TILE_INDEXES):
+      board[idx] = letter
+    colors = [color for color in puzzle_colors(solution, board) if color is not None]
+  return tiles_from_puzzle(letters, colors), solution
+
+
+def solve_line(job : Tuple[int, str]) -> Dict:
+  index, line = job
+  result : Dict = {'index': index}
+  try:
+    puzzle = json.loads(line)
+    if isinstance(puzzle, dict) and 'gameNumber' in puzzle:
+      result['gameNumber'] = puzzle['gameNumber']
+    tiles, solution = parse_puzzle(puzzle)
+    result.update(solver.solve(tiles))
+    result['num_swaps'] = len(result['swaps']) if result['swaps'] is not None else None
+    if solution is not None and result['words'] is not None:
+      result['correct'] = words_to_board(result['words']) == solution
+    if isinstance(puzzle, dict) and 'swapsRemaining' in puzzle and result['num_swaps'] is not None:
+      result['within_swaps'] = result['num_swaps'] <= puzzle['swapsRemaining']
+  # anything wrong with one puzzle is reported on its line instead of ending the whole run
+  except Exception as e:
+    result['error'] = '{}: {}'.format(type(e).__name__, e)
+  return result
+
+
+def read_jobs(lines : Iterable[str]) -> Iterator[Tuple[int, str]]:
+  index = 0
+  for line in lines:
+    if not line.strip():
+      continue
+    yield index, line
+    index += 1
+
+
+# solve every puzzle, yielding results in input order, or as they finish if unordered
+def solve_stream(lines : Iterable[str], workers : int, ordered : bool = True, chunksize : int = 4, words_path : str = WORDS_PATH, db_path : Optional[str] = None) -> Iterator[Dict]:
+  jobs = read_jobs(lines)
+  if workers <= 1:
+    init_worker(words_path, db_path)
+    yield from map(solve_line, jobs)
+    return
+
+  with multiprocessing.Pool(workers, initializer=init_worker, initargs=(words_path, db_path)) as pool:
+    if ordered:
+      yield from pool.imap(solve_line, jobs, chunksize)
+    else:
+      yield from pool.imap_unordered(solve_line, jobs, chunksize)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Solve a stream of waffle puzzles')
+  parser.add_argument('input', nargs='?', default='-', help='puzzles, one json per line (- for stdin)')
+  parser.add_argument('-o', '--output', default='-', help='results, one json per line (- for stdout)')
+  parser.add_argument('-w', '--workers', type=int, default=multiprocessing.cpu_count())
+  parser.add_argument('--unordered', action='store_true', help='write results as they finish instead of in input order')
+  parser.add_argument('--chunksize', type=int, default=4)
+  parser.add_argument('--words', default=WORDS_PATH)
+  parser.add_argument('--db', default=None, help='solution database to look puzzles up in before searching')
+  args = parser.parse_args()
+
+  source = sys.stdin if args.input == '-' else open(args.input)
+  sink = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+  start = time.perf_counter()
+  solved = total = 0
+  for result in solve_stream(source, args.workers, not args.unordered, args.chunksize, args.words, args.db):
+    total += 1
+    if result.get('words'):
+      solved += 1
+    sink.write(json.dumps(result) + '\n')
+    sink.flush()
+  elapsed = time.perf_counter() - start
+
+  print('Solved {}/{} puzzles in {:.2f}s, {:.1f} puzzles/sec with {} workers'.format(
+    solved, total, elapsed, total / elapsed if elapsed else 0.0, args.workers), file=sys.stderr)
+
+  if source is not sys.stdin:
+    source.close()
+  if sink is not sys.stdout:
+    sink.close()
+
+
+if __name__ == '__main__':
+  main()
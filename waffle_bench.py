@@ -0,0 +1,224 @@
+# Phase level benchmark over a versioned corpus of puzzles
+# Times propagation, candidate filtering, the word search and swap planning separately,
+# records peak memory and search node counts, and compares them against a stored baseline
+#
+#   python waffle_bench.py                     compare against bench/baseline.json
+#   python waffle_bench.py --update-baseline   store this run as the new baseline
+#   python waffle_bench.py --build-corpus      regenerate bench/corpus.json
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import waffle_batch
+from waffle_samples import SAMPLE_BOARDS
+from waffle_scrambler import scramble_waffles
+from waffle_search import words_to_board
+from waffle_solver import Board, TileTuple, WaffleSolver
+from waffle_swaps import SwapSearch
+
+CORPUS_PATH = 'bench/corpus.json'
+BASELINE_PATH = 'bench/baseline.json'
+# bump when the puzzles in the corpus change, baselines of other versions aren't compared
+CORPUS_VERSION = 2
+
+# how many random swaps the synthetic puzzles of each grade are scrambled with, enough for
+# the adversarial ones to end up about as shuffled as they get
+GRADES = [('easy', 3), ('medium', 6), ('hard', 10), ('adversarial', 50)]
+SYNTHETIC_PER_GRADE = 3
+
+# allowed slowdown before a metric counts as a regression, and noise to ignore for timings
+TIME_THRESHOLD = 1.5
+TIME_SLACK = 0.0005
+NODE_THRESHOLD = 1.1
+MEMORY_THRESHOLD = 1.25
+# node budget of the A* cross check, fully shuffled boards would run it for seconds
+SWAP_SEARCH_NODES = 20000
+
+PHASES = ['propagate', 'candidates', 'solutions', 'swaps', 'swap_search']
+
+
+def build_corpus(seed : int = 0) -> Dict:
+  solver = WaffleSolver()
+  rng = np.random.default_rng(seed)
+  puzzles : List[Dict] = []
+  solutions : List[str] = []
+
+  for k, tiles in enumerate(SAMPLE_BOARDS):
+    puzzles.append({'name': 'sample-{}'.format(k), 'grade': 'sample', 'tiles': [list(t) for t in tiles]})
+    words = solver.solutions(tiles)[0]
+    solutions.append(''.join(letter for letter in words_to_board(words) if letter))
+
+  with open('waffle_override.json') as f:
+    override = json.load(f)
+  puzzles.append({'name': 'override-{}'.format(override['gameNumber']), 'grade': 'sample', 'puzzle': override['puzzle'], 'solution': override['solution']})
+
+  # rescramble the known solutions, keeping the colors Waffle would show
+  for grade, swaps in GRADES:
+    waffles = [solutions[k % len(solutions)] for k in range(SYNTHETIC_PER_GRADE)]
+    for k, puzzle in enumerate(scramble_waffles(waffles, swaps, rng)):
+      puzzles.append({'name': '{}-{}'.format(grade, k), 'grade': grade, 'puzzle': puzzle['puzzle'], 'solution': puzzle['solution'], 'colors': puzzle['colors']})
+
+  return {'version': CORPUS_VERSION, 'seed': seed, 'puzzles': puzzles}
+
+
+# time every phase of one puzzle on a fresh board
+def run_phases(solver : WaffleSolver, tiles : List[TileTuple]) -> Tuple[Dict[str, float], Dict[str, int]]:
+  timings : Dict[str, float] = {}
+  counts : Dict[str, int] = {}
+  board = Board(tiles)
+
+  start = time.perf_counter()
+  solver.propagate(board)
+  timings['propagate'] = time.perf_counter() - start
+
+  start = time.perf_counter()
+  candidates = solver.candidates(board)
+  timings['candidates'] = time.perf_counter() - start
+  counts['candidates'] = sum(len(c) for c in candidates)
+
+  start = time.perf_counter()
+  answer = solver.solutions(board)
+  timings['solutions'] = time.perf_counter() - start
+  counts['search_nodes'] = board.search_nodes
+  counts['solutions'] = len(answer)
+  if not answer:
+    return timings, counts
+
+  start = time.perf_counter()
+  swaps = solver.plan_swaps(board, answer[0])
+  timings['swaps'] = time.perf_counter() - start
+  counts['swaps'] = len(swaps)
+
+  start = time.perf_counter()
+  swap_search = SwapSearch(words_to_board(answer[0]), max_nodes=SWAP_SEARCH_NODES)
+  swap_search.search(board.letters())
+  timings['swap_search'] = time.perf_counter() - start
+  counts['swap_search_nodes'] = swap_search.nodes
+  # an A* that gave up only says the budget ran out, its node count is the budget
+  counts['swap_search_gave_up'] = int(swap_search.limit_hit is not None)
+  return timings, counts
+
+
+def bench_puzzle(solver : WaffleSolver, tiles : List[TileTuple], repeat : int) -> Dict:
+  runs = [run_phases(solver, tiles) for _ in range(repeat)]
+  result : Dict = {'timings': {}, 'counts': runs[0][1]}
+  for phase in PHASES:
+    samples = [timings[phase] for timings, _ in runs if phase in timings]
+    if samples:
+      result['timings'][phase] = statistics.median(samples)
+
+  # peak memory on its own run, tracing slows everything else down
+  tracemalloc.start()
+  run_phases(solver, tiles)
+  result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return result
+
+
+def run_corpus(corpus : Dict, repeat : int, names : Optional[List[str]] = None) -> Dict:
+  solver = WaffleSolver()
+  results : Dict[str, Dict] = {}
+  for puzzle in corpus['puzzles']:
+    if names and puzzle['name'] not in names:
+      continue
+    tiles, _ = waffle_batch.parse_puzzle(puzzle)
+    results[puzzle['name']] = dict(bench_puzzle(solver, tiles, repeat), grade=puzzle['grade'])
+  return {'version': corpus['version'], 'results': results}
+
+
+# every metric that got worse than its threshold allows, and every one that got a lot better
+def compare(run : Dict, baseline : Dict) -> Tuple[List[str], List[str]]:
+  regressions : List[str] = []
+  speedups : List[str] = []
+
+  def check(name : str, metric : str, new : float, old : float, threshold : float, slack : float = 0.0) -> None:
+    if new > old * threshold + slack:
+      regressions.append('{} {}: {:.6g} -> {:.6g}'.format(name, metric, old, new))
+    elif new * threshold + slack < old:
+      speedups.append('{} {}: {:.6g} -> {:.6g}'.format(name, metric, old, new))
+
+  for name, result in run['results'].items():
+    old = baseline['results'].get(name)
+    if old is None:
+      continue
+    for phase, seconds in result['timings'].items():
+      if phase in old['timings']:
+        check(name, phase, seconds, old['timings'][phase], TIME_THRESHOLD, TIME_SLACK)
+    for metric in ['search_nodes', 'swap_search_nodes', 'candidates', 'swaps']:
+      if metric in result['counts'] and metric in old['counts']:
+        check(name, metric, result['counts'][metric], old['counts'][metric], NODE_THRESHOLD)
+    check(name, 'peak_memory', result['peak_memory'], old['peak_memory'], MEMORY_THRESHOLD)
+  return regressions, speedups
+
+
+def print_results(run : Dict) -> None:
+  print('{:<16} {:<12}'.format('puzzle', 'grade') + ''.join('{:>13}'.format(phase) for phase in PHASES) + '{:>10}{:>10}{:>10}'.format('nodes', 'a* nodes', 'peak KB'))
+  for name, result in run['results'].items():
+    timings = ''.join('{:>11.3f}ms'.format(result['timings'][phase] * 1000) if phase in result['timings'] else '{:>13}'.format('-') for phase in PHASES)
+    counts = result['counts']
+    print('{:<16} {:<12}'.format(name, result['grade']) + timings + '{:>10}{:>10}{:>10}'.format(
+      counts['search_nodes'], counts.get('swap_search_nodes', '-'), result['peak_memory'] // 1024))
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Benchmark every solver phase over the puzzle corpus')
+  parser.add_argument('--corpus', default=CORPUS_PATH)
+  parser.add_argument('--baseline', default=BASELINE_PATH)
+  parser.add_argument('--repeat', type=int, default=5, help='runs per puzzle, the median time is kept')
+  parser.add_argument('--only', nargs='*', help='names of the puzzles to run')
+  parser.add_argument('--update-baseline', action='store_true')
+  parser.add_argument('--build-corpus', action='store_true')
+  parser.add_argument('--output', help='also write this run as json here')
+  args = parser.parse_args()
+
+  if args.build_corpus:
+    with open(args.corpus, 'w') as f:
+      json.dump(build_corpus(), f, indent=1)
+    print('Wrote corpus to', args.corpus)
+    return
+
+  with open(args.corpus) as f:
+    corpus = json.load(f)
+  run = run_corpus(corpus, args.repeat, args.only)
+  print_results(run)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(run, f, indent=1)
+
+  if args.update_baseline:
+    with open(args.baseline, 'w') as f:
+      json.dump(run, f, indent=1)
+    print('Wrote baseline to', args.baseline)
+    return
+
+  try:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+  except FileNotFoundError:
+    print('No baseline at {}, run with --update-baseline to make one'.format(args.baseline))
+    return
+  if baseline['version'] != run['version']:
+    print('Baseline is for corpus version {}, this is version {}'.format(baseline['version'], run['version']))
+    return
+
+  regressions, speedups = compare(run, baseline)
+  print()
+  for line in speedups:
+    print('Faster:', line)
+  for line in regressions:
+    print('REGRESSION:', line)
+  print('{} regressions, {} speedups against {}'.format(len(regressions), len(speedups), args.baseline))
+  if regressions:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
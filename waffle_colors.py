@@ -0,0 +1,108 @@
+# Recompute the colors Waffle shows for a scrambled board given a solution
+# Candidate solutions whose colors don't match the puzzle can't be the answer
+#
+# A tile is green if it's in its place. Otherwise each of its words is checked like
+# wordle: the word's letters that aren't green yet are counted, and going through the
+# word in order, a tile is yellow for that word if some of its letter is still left,
+# using one up. A tile is yellow if it's yellow for any of its words, black otherwise
+#
+# Everything works on a batch of candidates at once, each as a row of a numpy array
+
+from typing import List, Optional
+
+import numpy as np
+
+from waffle_search import BOARD_SIZE, SLOT_SPACES, words_to_board
+
+NUM_LETTERS = 26
+BLACK, YELLOW, GREEN = 0, 1, 2
+COLORS = ['black', 'yellow', 'green']
+# letter code for the holes of the board
+HOLE = 255
+
+# spaces that belong to both a row and a column
+INTERSECTIONS = set(SLOT_SPACES[0]) | set(SLOT_SPACES[1]) | set(SLOT_SPACES[2])
+INTERSECTIONS &= set(SLOT_SPACES[3]) | set(SLOT_SPACES[4]) | set(SLOT_SPACES[5])
+
+
+def encode_board(board : List[Optional[str]]) -> np.ndarray:
+  return np.array([HOLE if letter is None else ord(letter) - ord('A') for letter in board], dtype=np.uint8)
+
+
+def encode_colors(colors : List[Optional[str]]) -> np.ndarray:
+  return np.array([BLACK if color is None else COLORS.index(color) for color in colors], dtype=np.uint8)
+
+
+def pack_words(words : List[str]) -> np.ndarray:
+  return np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8).reshape(-1, BOARD_SIZE) - ord('A')
+
+
+# yellow marks a word gives to the puzzle letters in its spaces, for a batch of solution words
+# against one puzzle word, or against a puzzle word per solution word
+def word_yellows(solution_words : np.ndarray, puzzle_word : np.ndarray) -> np.ndarray:
+  puzzle_words = np.broadcast_to(puzzle_word, solution_words.shape)
+  green = solution_words == puzzle_words
+  rows = np.arange(len(solution_words))
+  # letters of every solution word that aren't green yet, counted in one go over all rows
+  keys = (rows[:, None] * NUM_LETTERS + solution_words).ravel()
+  remaining = np.bincount(keys, weights=(~green).ravel(), minlength=len(solution_words) * NUM_LETTERS)
+  remaining = remaining.reshape(-1, NUM_LETTERS).astype(np.int8)
+
+  yellow = np.zeros(solution_words.shape, dtype=bool)
+  for pos in range(BOARD_SIZE):
+    letters = puzzle_words[:, pos]
+    yellow[:, pos] = ~green[:, pos] & (remaining[rows, letters] > 0)
+    remaining[rows, letters] -= yellow[:, pos].astype(np.int8)
+  return yellow
+
+
+# colors of the puzzle for each solution, solutions and puzzle as encoded boards. The puzzle
+# is either one board for every solution or a board per solution
+def board_colors(solutions : np.ndarray, puzzle : np.ndarray) -> np.ndarray:
+  puzzles = np.broadcast_to(puzzle, solutions.shape)
+  colors = np.where(solutions == puzzles, GREEN, BLACK).astype(np.uint8)
+  # the words of all six slots of every solution go through word_yellows as one batch
+  spaces = np.array(SLOT_SPACES)
+  yellows = word_yellows(solutions[:, spaces].reshape(-1, BOARD_SIZE), puzzles[:, spaces].reshape(-1, BOARD_SIZE))
+  yellows = yellows.reshape(len(solutions), len(SLOT_SPACES), BOARD_SIZE)
+  for slot, slot_spaces in enumerate(SLOT_SPACES):
+    colors[:, slot_spaces] = np.where(yellows[:, slot], YELLOW, colors[:, slot_spaces])
+  colors[puzzles == HOLE] = BLACK
+  return colors
+
+
+# which candidate waffles (lists of six words) give exactly the puzzle's colors
+def matching_solutions(candidates : List[List[str]], puzzle : List[Optional[str]], colors : List[Optional[str]]) -> List[bool]:
+  if not candidates:
+    return []
+  solutions = np.stack([encode_board(words_to_board(words)) for words in candidates])
+  observed = encode_colors(colors)
+  return (board_colors(solutions, encode_board(puzzle)) == observed[None, :]).all(axis=1).tolist()
+
+
+# which words can go in a slot without contradicting the colors of its own spaces. A word
+# decides the green tiles and non intersection tiles of its spaces, but an intersection tile
+# it leaves black can still be made yellow by the crossing word
+def matching_words(slot : int, words : List[str], puzzle : List[Optional[str]], colors : List[Optional[str]]) -> List[bool]:
+  if not words:
+    return []
+  spaces = SLOT_SPACES[slot]
+  solution_words = pack_words(words)
+  puzzle_word = encode_board(puzzle)[spaces]
+  observed = encode_colors(colors)[spaces]
+
+  green = solution_words == puzzle_word[None, :]
+  yellow = word_yellows(solution_words, puzzle_word)
+  crossing = np.array([idx in INTERSECTIONS for idx in spaces])
+  ok = green == (observed == GREEN)[None, :]
+  # tiles only in this word get their color from this word alone
+  ok &= ~(~crossing[None, :] & ~green) | (yellow == (observed == YELLOW)[None, :])
+  # a crossing tile this word makes yellow can't be black
+  ok &= ~(crossing[None, :] & yellow & (observed == BLACK)[None, :])
+  return ok.all(axis=1).tolist()
+
+
+# color names the puzzle shows for a single solution, both as boards with None for the holes
+def puzzle_colors(solution : List[Optional[str]], puzzle : List[Optional[str]]) -> List[Optional[str]]:
+  colors = board_colors(encode_board(solution)[None, :], encode_board(puzzle))[0]
+  return [None if letter is None else COLORS[color] for letter, color in zip(puzzle, colors)]
@@ -0,0 +1,246 @@
+# Local solver service that keeps the compiled dictionary warm between games
+# Clients send one puzzle per line of JSON (same shapes waffle_batch.py reads) over a unix
+# socket and get one result per line back, or POST a puzzle to /solve over localhost http.
+# {"op": "stats"} on the socket, or GET /stats, reports latency percentiles and queue depth
+#
+#   python waffle_daemon.py --socket /tmp/waffle.sock --http 8765 --workers 4
+
+import argparse
+import collections
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Optional
+
+import waffle_batch
+from waffle_words import WORDS_PATH
+
+SOCKET_PATH = '/tmp/waffle.sock'
+# latencies kept for the percentiles
+LATENCY_WINDOW = 10000
+# how long a client waits on the daemon before solving by itself
+REMOTE_TIMEOUT = 10.0
+# connections the socket server lets wait to be accepted, games on many sessions at once
+# all ask it together
+LISTEN_BACKLOG = 128
+# pause between connects while the backlog is full
+CONNECT_RETRY = 0.005
+
+
+class SolverService():
+  def __init__(self, workers : int, words_path : str = WORDS_PATH, db_path : Optional[str] = None) -> None:
+    # solve in the request threads with one solver, or hand off to warm worker processes
+    self.workers = workers
+    self.initargs = (words_path, db_path)
+    self.pool : Optional[ProcessPoolExecutor] = None
+    if workers > 0:
+      self.pool = self.new_pool()
+    else:
+      waffle_batch.init_worker(words_path, db_path)
+    self.lock = threading.Lock()
+    self.restarts = 0
+    self.latencies : Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+    self.in_flight = 0
+    self.max_in_flight = 0
+    self.requests = 0
+    self.errors = 0
+    self.started = time.time()
+
+  def new_pool(self) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(self.workers, initializer=waffle_batch.init_worker, initargs=self.initargs)
+
+  # a killed worker breaks the whole pool, start a new one unless another request already has
+  def restart_pool(self, broken : ProcessPoolExecutor) -> None:
+    with self.lock:
+      if self.pool is not broken:
+        return
+      self.pool = self.new_pool()
+      self.restarts += 1
+    broken.shutdown(wait=False)
+
+  def submit(self, line : str) -> Dict:
+    pool = self.pool
+    try:
+      return pool.submit(waffle_batch.solve_line, (0, line)).result()
+    except BrokenProcessPool:
+      self.restart_pool(pool)
+      return self.pool.submit(waffle_batch.solve_line, (0, line)).result()
+
+  def solve(self, line : str) -> Dict:
+    start = time.perf_counter()
+    with self.lock:
+      self.in_flight += 1
+      self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    try:
+      if self.pool is not None:
+        result = self.submit(line)
+      else:
+        result = waffle_batch.solve_line((0, line))
+    # a worker that died or a bug still gets the client a reply, and shows up in the stats
+    except Exception as e:
+      result = {'error': '{}: {}'.format(type(e).__name__, e)}
+    finally:
+      latency = time.perf_counter() - start
+      with self.lock:
+        self.in_flight -= 1
+        self.requests += 1
+        self.latencies.append(latency)
+    result.pop('index', None)
+    if 'error' in result:
+      with self.lock:
+        self.errors += 1
+    result['latency'] = latency
+    return result
+
+  def stats(self) -> Dict:
+    with self.lock:
+      latencies = sorted(self.latencies)
+      stats = {
+        'requests': self.requests,
+        'errors': self.errors,
+        # requests waiting on or being solved right now
+        'queue_depth': self.in_flight,
+        'max_queue_depth': self.max_in_flight,
+        'pool_restarts': self.restarts,
+        'uptime': time.time() - self.started,
+      }
+    for name, q in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)]:
+      stats[name] = latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+    stats['max'] = latencies[-1] if latencies else None
+    return stats
+
+  def handle(self, line : str) -> Dict:
+    try:
+      request = json.loads(line)
+    except ValueError as e:
+      with self.lock:
+        self.errors += 1
+      return {'error': 'ValueError: {}'.format(e)}
+    if isinstance(request, dict) and request.get('op') == 'stats':
+      return self.stats()
+    return self.solve(line)
+
+  def close(self) -> None:
+    if self.pool is not None:
+      self.pool.shutdown()
+
+
+class SocketHandler(socketserver.StreamRequestHandler):
+  def handle(self) -> None:
+    for line in self.rfile:
+      if not line.strip():
+        continue
+      result = self.server.service.handle(line.decode('utf-8'))
+      self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+      self.wfile.flush()
+
+
+class SocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+  request_queue_size = LISTEN_BACKLOG
+
+  def __init__(self, path : str, service : SolverService) -> None:
+    # clear out the socket of a previous run
+    if os.path.exists(path):
+      os.unlink(path)
+    super().__init__(path, SocketHandler)
+    self.service = service
+
+
+class HTTPHandler(BaseHTTPRequestHandler):
+  def reply(self, result : Dict, status : int = 200) -> None:
+    body = json.dumps(result).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self) -> None:
+    if self.path == '/stats':
+      self.reply(self.server.service.stats())
+    else:
+      self.reply({'error': 'not found'}, 404)
+
+  def do_POST(self) -> None:
+    if self.path != '/solve':
+      self.reply({'error': 'not found'}, 404)
+      return
+    length = int(self.headers.get('Content-Length', 0))
+    self.reply(self.server.service.handle(self.rfile.read(length).decode('utf-8')))
+
+  # keep the request log out of the way
+  def log_message(self, format : str, *args) -> None:
+    pass
+
+
+# with a timeout set a unix socket connect doesn't wait for room in a full backlog, it fails
+# straight away, so keep trying until the deadline
+def connect(client : socket.socket, path : str, deadline : float) -> None:
+  while True:
+    try:
+      client.connect(path)
+      return
+    except BlockingIOError:
+      if time.monotonic() > deadline:
+        raise socket.timeout('daemon backlog stayed full')
+      time.sleep(CONNECT_RETRY)
+
+
+# solve a puzzle on a running daemon. None if there's no daemon listening, or it didn't
+# answer in time
+def solve_remote(puzzle, path : str = SOCKET_PATH, timeout : float = REMOTE_TIMEOUT) -> Optional[Dict]:
+  try:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+      client.settimeout(timeout)
+      connect(client, path, time.monotonic() + timeout)
+      client.sendall((json.dumps(puzzle) + '\n').encode('utf-8'))
+      with client.makefile('rb') as reply:
+        line = reply.readline()
+    if not line:
+      return None
+  # no socket, nothing listening on it, or the daemon went away or timed out mid request
+  except (FileNotFoundError, ConnectionError, socket.timeout):
+    return None
+  return json.loads(line)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Serve waffle solves from a warm dictionary')
+  parser.add_argument('--socket', default=SOCKET_PATH, help='unix socket to listen on')
+  parser.add_argument('--http', type=int, default=None, help='also listen on this localhost port')
+  parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='solver processes, 0 to solve in the request threads')
+  parser.add_argument('--words', default=WORDS_PATH)
+  parser.add_argument('--db', default=None, help='solution database to look puzzles up in before searching')
+  args = parser.parse_args()
+
+  service = SolverService(args.workers, args.words, args.db)
+  servers = [SocketServer(args.socket, service)]
+  if args.http is not None:
+    http_server = ThreadingHTTPServer(('127.0.0.1', args.http), HTTPHandler)
+    http_server.daemon_threads = True
+    http_server.service = service
+    servers.append(http_server)
+
+  for server in servers[1:]:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+  print('Serving on', args.socket, 'and http://127.0.0.1:{}'.format(args.http) if args.http else '')
+  try:
+    servers[0].serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    for server in servers:
+      server.server_close()
+    os.unlink(args.socket)
+    service.close()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,142 @@
+# Database of solved waffles indexed by their letters, so a puzzle can be looked up instead of searched
+# A scrambled puzzle has exactly the letters of its solution, so every waffle is filed under a
+# hash of its 21 letter multiset. A lookup takes the waffles with the puzzle's multiset, keeps
+# those that have the puzzle's green tiles where they are, then those that give back exactly
+# the puzzle's colors
+#
+# Only one waffle of each transpose pair is stored (the generator's canonical one) and both are
+# tried on lookup, they have the same letters. The database is built from a binary file of
+# waffle_generator.py and laid out like the compiled dictionary, so it's memory mapped too
+#
+#   python waffle_generator.py --binary waffles.bin
+#   python waffle_db.py waffles.bin -o waffles.db
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from waffle_colors import GREEN, HOLE, board_colors, encode_board, encode_colors
+from waffle_generator import read_waffle_ids
+from waffle_search import BOARD_SIZE, SLOT_SPACES
+from waffle_words import NUM_LETTERS, WORDS_PATH, WordMatrix, load_word_matrix, map_artifact, read_artifact_header, source_digest, write_artifact
+
+DB_PATH = 'waffles.db'
+DB_MAGIC = b'SOLVEDDB'
+# bump whenever the layout or the hash changes so old databases are refused
+DB_VERSION = 2
+# multiset hash is the letter counts dotted with these, wrapping around 64 bits. They're only
+# drawn when building, the database keeps the ones it was built with for its lookups, so a
+# numpy that draws them differently doesn't break existing databases
+HASH_MULTIPLIERS = np.random.default_rng(130).integers(1, 2 ** 63, NUM_LETTERS, dtype=np.uint64) | np.uint64(1)
+# word order of a waffle's transpose, rows and columns swap
+TRANSPOSE = [3, 4, 5, 0, 1, 2]
+# waffles hashed at a time while building
+BUILD_BATCH = 1 << 20
+
+'''
+Database arrays:
+
+  multipliers:  the hash's multiplier of every letter
+  keys:         sorted multiset hashes, each once
+  offsets:      the waffles with keys[k] are waffles[offsets[k]:offsets[k + 1]]
+  waffles:      six uint16 word ids per waffle, in the generator's word order
+'''
+
+
+# board of every waffle given as six word ids, HOLE for the holes
+def waffle_boards(waffles : np.ndarray, word_matrix : WordMatrix) -> np.ndarray:
+  letters = word_matrix.letters[waffles.astype(np.int64)]
+  boards = np.full((len(waffles), BOARD_SIZE * BOARD_SIZE), HOLE, dtype=np.uint8)
+  for slot, spaces in enumerate(SLOT_SPACES):
+    boards[:, spaces] = letters[:, slot, :]
+  return boards
+
+
+def letter_counts(boards : np.ndarray) -> np.ndarray:
+  tiles = boards[:, boards[0] != HOLE].astype(np.int64)
+  keys = (np.arange(len(boards))[:, None] * NUM_LETTERS + tiles).ravel()
+  return np.bincount(keys, minlength=len(boards) * NUM_LETTERS).reshape(-1, NUM_LETTERS).astype(np.uint64)
+
+
+def multiset_hashes(boards : np.ndarray, multipliers : np.ndarray = HASH_MULTIPLIERS) -> np.ndarray:
+  return (letter_counts(boards) * multipliers[None, :]).sum(axis=1, dtype=np.uint64)
+
+
+def build_db(waffles_path : str, db_path : str = DB_PATH, words_path : str = WORDS_PATH) -> int:
+  word_matrix = load_word_matrix(words_path)
+  waffles = read_waffle_ids(waffles_path, words_path)
+  hashes = np.concatenate([multiset_hashes(waffle_boards(waffles[i:i + BUILD_BATCH], word_matrix))
+                           for i in range(0, len(waffles), BUILD_BATCH)]) if len(waffles) else np.zeros(0, dtype=np.uint64)
+
+  order = np.argsort(hashes, kind='stable')
+  hashes = hashes[order]
+  keys, starts = np.unique(hashes, return_index=True)
+  offsets = np.append(starts, len(hashes)).astype(np.int64)
+  arrays = {'multipliers': HASH_MULTIPLIERS, 'keys': keys, 'offsets': offsets, 'waffles': np.ascontiguousarray(waffles[order])}
+  write_artifact(db_path, arrays, {'source_digest': source_digest(words_path)}, DB_MAGIC, DB_VERSION)
+  return len(keys)
+
+
+class SolutionDB():
+  def __init__(self, db_path : str = DB_PATH, word_matrix : Optional[WordMatrix] = None, words_path : str = WORDS_PATH) -> None:
+    result = read_artifact_header(db_path, DB_MAGIC, DB_VERSION)
+    if result is None:
+      raise ValueError('{} is not a version {} waffle database'.format(db_path, DB_VERSION))
+    header, data_start = result
+    if header['source_digest'] != source_digest(words_path):
+      raise ValueError('{} was built from a different word list than {}'.format(db_path, words_path))
+    arrays = map_artifact(db_path, header, data_start)
+    self.multipliers = arrays['multipliers']
+    self.keys = arrays['keys']
+    self.offsets = arrays['offsets']
+    self.waffles = arrays['waffles']
+    self.word_matrix = word_matrix if word_matrix is not None else load_word_matrix(words_path)
+
+  def __len__(self) -> int:
+    return len(self.waffles)
+
+  # waffles (either way round) with the same letters as the puzzle, as word ids
+  def same_letters(self, puzzle : np.ndarray) -> np.ndarray:
+    key = multiset_hashes(puzzle[None, :], self.multipliers)[0]
+    k = np.searchsorted(self.keys, key)
+    if k == len(self.keys) or self.keys[k] != key:
+      return np.zeros((0, len(TRANSPOSE)), dtype=self.waffles.dtype)
+    waffles = self.waffles[self.offsets[k]:self.offsets[k + 1]]
+    return np.concatenate([waffles, waffles[:, TRANSPOSE]])
+
+  # every stored waffle that could be the puzzle's answer, an empty list on a miss
+  def lookup(self, puzzle : List[Optional[str]], colors : List[Optional[str]]) -> List[List[str]]:
+    encoded = encode_board(puzzle)
+    waffles = self.same_letters(encoded)
+    if not len(waffles):
+      return []
+    boards = waffle_boards(waffles, self.word_matrix)
+    # hashes can collide, so check the letters really match
+    keep = (letter_counts(boards) == letter_counts(encoded[None, :])).all(axis=1)
+    observed = encode_colors(colors)
+    greens = observed == GREEN
+    keep &= (boards[:, greens] == encoded[None, greens]).all(axis=1)
+    waffles, boards = waffles[keep], boards[keep]
+    if not len(waffles):
+      return []
+    keep = (board_colors(boards, encoded) == observed[None, :]).all(axis=1)
+    return [[self.word_matrix.words[i] for i in waffle] for waffle in waffles[keep].tolist()]
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Build a database of waffles indexed by their letters')
+  parser.add_argument('waffles', help='binary waffle file from waffle_generator.py --binary')
+  parser.add_argument('-o', '--output', default=DB_PATH)
+  parser.add_argument('--words', default=WORDS_PATH)
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  keys = build_db(args.waffles, args.output, args.words)
+  print('Wrote {} letter sets to {} in {:.1f}s'.format(keys, args.output, time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == '__main__':
+  main()
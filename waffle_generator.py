@@ -1,34 +1,146 @@
-from typing import Dict, List, Set, Tuple
-
-BOARD_SIZE = 5
-NUM_WORDS = 6
-
-first : Dict[str, Set[str]] = {}
-middle : Dict[str, Set[str]] = {}
-first_middle : Dict[Tuple[str, str], Set[str]] = {}
-first_middle_end : Dict[Tuple[str, str, str], Set[str]] = {}
-
-# iterate over all capital letters
-for i in range(ord('A'), ord('Z') + 1):
-  first[chr(i)] = set()
-  middle[chr(i)] = set()
-
-for i in range(ord('A'), ord('Z') + 1):
-  for j in range(ord('A'), ord('Z') + 1):
-    first_middle[(chr(i), chr(j))] = set()
-
-for i in range(ord('A'), ord('Z') + 1):
-  for j in range(ord('A'), ord('Z') + 1):
-    for k in range(ord('A'), ord('Z') + 1):
-      first_middle_end[(chr(i), chr(j), chr(k))] = set()
-
-with open('words.txt') as f:
-  for word in f.readlines():
-    word = word.strip().upper()
-    first[word[0]].add(word)
-    middle[word[2]].add(word)
-    first_middle[(word[0], word[2])].add(word)
-    first_middle_end[(word[0], word[2], word[-1])].add(word)
+# Enumerate every valid waffle, six different dictionary words crossing at the corners and middles
+# Every waffle transposed is a waffle too, only the one whose middle row has a smaller word id
+# than its middle column is generated
+#
+# Waffles can be printed as grids or written as a binary file of word ids, to build the whole
+# solution space once and read it back later. The whole space is built by splitting it into
+# shards by center letter, or by center letter and middle column, generating the shards over a
+# pool of processes into their own files and merging those in order. Finished shard files are
+# kept, so an interrupted run picks up where it left off
+#
+#   python waffle_generator.py --limit 100
+#   python waffle_generator.py --binary waffles.bin
+#   python waffle_generator.py --binary waffles.bin --workers 8 --shard-by word
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from waffle_search import BOARD_SIZE, NUM_WORDS
+from waffle_words import NUM_LETTERS, WORDS_PATH, WordMatrix, artifact_data_start, load_word_matrix, map_artifact, read_artifact_header, source_digest, temp_path
+
+WAFFLES_MAGIC = b'WAFFLEID'
+WAFFLES_VERSION = 1
+# runs of last columns collected before numpy expands them into a block of waffles
+BLOCK_SIZE = 65536
+SHARD_DIR = 'waffle_shards'
+
+# a center letter, and optionally the middle column, that all waffles of a shard share
+Shard = Tuple[str, Optional[str]]
+
+'''
+Binary waffle file layout:
+
+  8 bytes   magic
+  4 bytes   version (little endian uint32)
+  4 bytes   length of the json header (little endian uint32)
+  header    json with the digest of the word list the ids index into
+  waffles   from the next 64 byte boundary on, six little endian uint16 word ids per waffle
+            in the order first row, middle row, last row, first column, middle column, last column
+'''
+
+
+class WaffleTables():
+  def __init__(self, word_matrix : WordMatrix) -> None:
+    # the compiled dictionary's first_middle_end CSR index (words by first, middle and last
+    # letter, laid out when the dictionary is compiled) as lists that are quick to slice from
+    # python. A key is (first * 26 + middle) * 26 + last, so all the words with a first and
+    # middle letter are the run from that key with last 0 to the next. Words are handled as
+    # integer ids throughout and only their first and last letters are looked at
+    self.word_matrix = word_matrix
+    self.firsts : List[int] = word_matrix.letters[:, 0].tolist()
+    self.lasts : List[int] = word_matrix.letters[:, -1].tolist()
+    # ids and offsets share one int object per value, most offsets repeat the one before
+    values = list(range(len(word_matrix) + 1))
+    self.first_middle_end_ids : List[int] = [values[i] for i in word_matrix.first_middle_end_ids.tolist()]
+    self.first_middle_end_offsets : List[int] = [values[i] for i in word_matrix.first_middle_end_offsets.tolist()]
+
+  # ids of the words with this letter in the middle
+  def middle(self, letter : int) -> List[int]:
+    return self.word_matrix.position(2, letter).tolist()
+
+  # shards in the order waffles() goes through them, by center letter or also by middle column
+  def shards(self, by_word : bool = False) -> List[Shard]:
+    letters = [letter for letter in range(NUM_LETTERS) if self.middle(letter)]
+    if by_word:
+      return [(chr(ord('A') + letter), self.word_matrix.words[vert_mid]) for letter in letters for vert_mid in self.middle(letter)]
+    return [(chr(ord('A') + letter), None) for letter in letters]
+
+  # waffles as rows of word ids [first_row, horz_mid, last_row, first_column, vert_mid, last_column],
+  # all of them or just those of one shard, a block of about block_size at a time. The last
+  # columns that fit the rest of a waffle are a contiguous run of first_middle_end, so only the
+  # runs are collected in python and numpy expands them into waffles
+  def waffle_blocks(self, shard : Optional[Shard] = None, block_size : int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    firsts, lasts = self.firsts, self.lasts
+    ids, offsets = self.first_middle_end_ids, self.first_middle_end_offsets
+    prefixes : List[Tuple[int, ...]] = []
+    runs : List[Tuple[int, int]] = []
+
+    for letter in ([ord(shard[0]) - ord('A')] if shard else range(NUM_LETTERS)):
+      middles = self.middle(letter)
+      for vert_mid in ([self.word_matrix.words.index(shard[1])] if shard and shard[1] else middles):
+        first_rows = self.middle(firsts[vert_mid])
+        vert_last = lasts[vert_mid]
+        for horz_mid in middles:
+          # the transpose of a waffle swaps its middle row and column
+          if horz_mid >= vert_mid:
+            break
+          horz_first, horz_last = firsts[horz_mid], lasts[horz_mid]
+          for first_row in first_rows:
+            if first_row == vert_mid or first_row == horz_mid:
+              continue
+            # words by first and middle letter are a contiguous run of first_middle_end
+            key = (firsts[first_row] * NUM_LETTERS + horz_first) * NUM_LETTERS
+            last_key = (lasts[first_row] * NUM_LETTERS + horz_last) * NUM_LETTERS
+            for first_column in ids[offsets[key]:offsets[key + NUM_LETTERS]]:
+              if first_column == first_row or first_column == vert_mid or first_column == horz_mid:
+                continue
+              key = (lasts[first_column] * NUM_LETTERS + vert_last) * NUM_LETTERS
+              for last_row in ids[offsets[key]:offsets[key + NUM_LETTERS]]:
+                if last_row == vert_mid or last_row == horz_mid or last_row == first_row or last_row == first_column:
+                  continue
+                key = last_key + lasts[last_row]
+                if offsets[key] != offsets[key + 1]:
+                  prefixes.append((first_row, horz_mid, last_row, first_column, vert_mid))
+                  runs.append((offsets[key], offsets[key + 1]))
+                  if len(prefixes) == block_size:
+                    yield self.expand_runs(prefixes, runs)
+                    prefixes, runs = [], []
+    if prefixes:
+      yield self.expand_runs(prefixes, runs)
+
+  # every prefix of five words with each last column of its run, less the ones reusing a word
+  def expand_runs(self, prefixes : List[Tuple[int, ...]], runs : List[Tuple[int, int]]) -> np.ndarray:
+    starts, ends = np.array(runs, dtype=np.int64).T
+    lengths = ends - starts
+    rows = np.repeat(np.array(prefixes, dtype=np.uint16), lengths, axis=0)
+    positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    last_columns = self.word_matrix.first_middle_end_ids[positions].astype(np.uint16)
+    waffles = np.concatenate([rows, last_columns[:, None]], axis=1)
+    return waffles[(rows != last_columns[:, None]).all(axis=1)]
+
+  def waffle_ids(self, shard : Optional[Shard] = None) -> Iterator[Tuple[int, ...]]:
+    for block in self.waffle_blocks(shard):
+      yield from map(tuple, block.tolist())
+
+  def waffles(self, shard : Optional[Shard] = None) -> Iterator[List[str]]:
+    words = self.word_matrix.words
+    for waffle in self.waffle_ids(shard):
+      yield [words[i] for i in waffle]
+
+
+def generate_waffles(limit : Optional[int] = None, word_matrix : Optional[WordMatrix] = None) -> Iterator[List[str]]:
+  tables = WaffleTables(word_matrix if word_matrix is not None else load_word_matrix())
+  return itertools.islice(tables.waffles(), limit)
+
 
 def print_words_as_waffle(words : List[str]) -> None:
   waffle : List[List[str]] = []
@@ -49,22 +161,144 @@ def print_words_as_waffle(words : List[str]) -> None:
     print(''.join(waffle[i]))
   print()
 
-for letter in middle:
-  for vert_mid in middle[letter]:
-    for horz_mid in middle[letter]:
-      if vert_mid == horz_mid:
-        continue
-      for first_row in middle[vert_mid[0]]:
-        if first_row in [vert_mid, horz_mid]:
-          continue
-        for first_column in first_middle[(first_row[0], horz_mid[0])]:
-          if first_column in [first_row, vert_mid, horz_mid]:
-            continue
-          for last_row in first_middle[(first_column[-1], vert_mid[-1])]:
-            if last_row in [vert_mid, horz_mid, first_row, first_column]:
-              continue
-            for last_column in first_middle_end[(first_row[-1], horz_mid[-1], last_row[-1])]:
-              if last_column in [vert_mid, horz_mid, first_row, first_column, last_row]:
-                continue
-              words = [first_row, horz_mid, last_row, first_column, vert_mid, last_column]
-              print_words_as_waffle(words)
+
+# write the header of a waffle file, leaving the file where the waffles go
+def write_waffles_header(f, num_words : int, words_path : str) -> None:
+  assert(num_words <= np.iinfo(np.uint16).max)
+  header_bytes = json.dumps({'source_digest': source_digest(words_path), 'num_words': num_words}).encode('utf-8')
+  prefix = WAFFLES_MAGIC + struct.pack('<II', WAFFLES_VERSION, len(header_bytes)) + header_bytes
+  # pad out to the waffles rather than seek, so a file without waffles is still whole
+  f.write(prefix.ljust(artifact_data_start(len(header_bytes)), b'\0'))
+
+
+# write blocks of waffles as word ids, returns how many were written. The file is written under
+# a temporary name and renamed, so a file at path is always complete
+def write_waffles(path : str, blocks : Iterator[np.ndarray], num_words : int, words_path : str = WORDS_PATH) -> int:
+  tmp_path = temp_path(path)
+  count = 0
+  with open(tmp_path, 'wb') as f:
+    write_waffles_header(f, num_words, words_path)
+    for block in blocks:
+      f.write(block.astype('<u2').tobytes())
+      count += len(block)
+  os.replace(tmp_path, path)
+  return count
+
+
+# blocks cut off after limit waffles in total
+def limit_blocks(blocks : Iterator[np.ndarray], limit : Optional[int]) -> Iterator[np.ndarray]:
+  for block in blocks:
+    if limit is not None:
+      if limit <= 0:
+        return
+      block = block[:limit]
+      limit -= len(block)
+    yield block
+
+
+# tables of the worker process, built once by init_worker
+tables : Optional[WaffleTables] = None
+tables_words_path = WORDS_PATH
+
+
+def init_worker(words_path : str) -> None:
+  global tables, tables_words_path
+  tables = WaffleTables(load_word_matrix(words_path))
+  tables_words_path = words_path
+
+
+def shard_path(shard_dir : str, shard : Shard) -> str:
+  return os.path.join(shard_dir, '-'.join(key for key in shard if key) + '.bin')
+
+
+def generate_shard(job : Tuple[Shard, str]) -> Tuple[Shard, int, float]:
+  shard, path = job
+  start = time.perf_counter()
+  count = write_waffles(path, tables.waffle_blocks(shard), len(tables.word_matrix), tables_words_path)
+  return shard, count, time.perf_counter() - start
+
+
+# generate every shard that doesn't have a file yet over a pool of processes, reporting progress
+# to stderr, returns the shard files in order
+def generate_shards(shard_dir : str, workers : int, by_word : bool = False, words_path : str = WORDS_PATH, word_matrix : Optional[WordMatrix] = None) -> List[str]:
+  os.makedirs(shard_dir, exist_ok=True)
+  word_matrix = word_matrix if word_matrix is not None else load_word_matrix(words_path)
+  shards = WaffleTables(word_matrix).shards(by_word)
+  paths = [shard_path(shard_dir, shard) for shard in shards]
+  jobs = [(shard, path) for shard, path in zip(shards, paths) if not os.path.exists(path)]
+  print('{} shards, {} already done'.format(len(paths), len(paths) - len(jobs)), file=sys.stderr)
+
+  start = time.perf_counter()
+  total = 0
+  with multiprocessing.Pool(workers, initializer=init_worker, initargs=(words_path,)) as pool:
+    for done, (shard, count, elapsed) in enumerate(pool.imap_unordered(generate_shard, jobs), 1):
+      total += count
+      so_far = time.perf_counter() - start
+      print('[{}/{}] shard {} {} waffles in {:.1f}s, {} waffles total, {:.0f} waffles/sec, {:.0f}s left'.format(
+        done, len(jobs), '-'.join(key for key in shard if key), count, elapsed, total, total / so_far if so_far else 0.0,
+        so_far / done * (len(jobs) - done)), file=sys.stderr)
+  return paths
+
+
+# concatenate shard files into one waffle file, returns how many waffles it holds
+def merge_waffles(paths : List[str], path : str, num_words : int, words_path : str = WORDS_PATH) -> int:
+  tmp_path = temp_path(path)
+  count = 0
+  with open(tmp_path, 'wb') as f:
+    write_waffles_header(f, num_words, words_path)
+    for shard in paths:
+      ids = read_waffle_ids(shard, words_path)
+      f.write(ids.astype('<u2').tobytes())
+      count += len(ids)
+  os.replace(tmp_path, path)
+  return count
+
+
+# word ids of every waffle in a binary file, one row of six per waffle, mapped read-only
+def read_waffle_ids(path : str, words_path : str = WORDS_PATH) -> np.ndarray:
+  result = read_artifact_header(path, WAFFLES_MAGIC, WAFFLES_VERSION)
+  if result is None:
+    raise ValueError('{} is not a version {} waffle file'.format(path, WAFFLES_VERSION))
+  header, data_start = result
+  if header['source_digest'] != source_digest(words_path):
+    raise ValueError('{} was generated from a different word list than {}'.format(path, words_path))
+  # the waffles run to the end of the file, it's written as it's generated so the header can't say how many
+  count = (os.path.getsize(path) - data_start) // (NUM_WORDS * 2)
+  return map_artifact(path, {'arrays': {'ids': [0, '<u2', [count, NUM_WORDS]]}}, data_start)['ids']
+
+
+def read_waffles(path : str, word_matrix : Optional[WordMatrix] = None, words_path : str = WORDS_PATH) -> Iterator[List[str]]:
+  word_matrix = word_matrix if word_matrix is not None else load_word_matrix(words_path)
+  for ids in read_waffle_ids(path, words_path).tolist():
+    yield [word_matrix.words[i] for i in ids]
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Enumerate every valid waffle, one of each transpose pair')
+  parser.add_argument('--limit', type=int, default=None, help='stop after this many waffles')
+  parser.add_argument('--binary', default=None, help='write word ids here instead of printing grids')
+  parser.add_argument('--words', default=WORDS_PATH)
+  parser.add_argument('-w', '--workers', type=int, default=1, help='more than one generates shards in parallel, needs --binary')
+  parser.add_argument('--shard-by', choices=['letter', 'word'], default='letter', help='split by center letter, or also by middle column')
+  parser.add_argument('--shard-dir', default=SHARD_DIR)
+  args = parser.parse_args()
+
+  if args.workers > 1 and (not args.binary or args.limit is not None):
+    parser.error('sharded generation writes the whole space, it needs --binary and no --limit')
+
+  word_matrix = load_word_matrix(args.words)
+  if args.workers > 1:
+    paths = generate_shards(args.shard_dir, args.workers, args.shard_by == 'word', args.words, word_matrix)
+    count = merge_waffles(paths, args.binary, len(word_matrix), args.words)
+    print('Merged {} shards, {} waffles to {}'.format(len(paths), count, args.binary), file=sys.stderr)
+  elif args.binary:
+    blocks = limit_blocks(WaffleTables(word_matrix).waffle_blocks(), args.limit)
+    count = write_waffles(args.binary, blocks, len(word_matrix), args.words)
+    print('Wrote {} waffles to {}'.format(count, args.binary), file=sys.stderr)
+  else:
+    for words in generate_waffles(args.limit, word_matrix):
+      print_words_as_waffle(words)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,94 @@
+# Timings, counts and peak sizes of a run, for keeping an eye on the bot
+# Phases add up how long they ran and how often, counts add up (search nodes, candidates,
+# swaps, ...) and peaks keep the largest value seen (the most candidates a word kept, the
+# longest A* queue, ...), so a slow or exploding board shows up even among many normal ones
+#
+# A run is written out as json and as a Prometheus textfile for node_exporter's textfile
+# collector, both replaced atomically so a scrape never sees half a file
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+PREFIX = 'waffle'
+
+
+class Metrics():
+  def __init__(self) -> None:
+    self.started = time.time()
+    self.seconds : Dict[str, float] = {}
+    self.calls : Dict[str, int] = {}
+    self.max_seconds : Dict[str, float] = {}
+    self.counts : Dict[str, int] = {}
+    self.peaks : Dict[str, int] = {}
+    # games run on threads sharing one solver
+    self.lock = threading.Lock()
+
+  def add_time(self, phase : str, seconds : float) -> None:
+    with self.lock:
+      self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+      self.calls[phase] = self.calls.get(phase, 0) + 1
+      self.max_seconds[phase] = max(self.max_seconds.get(phase, 0.0), seconds)
+
+  @contextmanager
+  def time(self, phase : str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.add_time(phase, time.perf_counter() - start)
+
+  def count(self, name : str, value : int = 1) -> None:
+    with self.lock:
+      self.counts[name] = self.counts.get(name, 0) + value
+
+  def peak(self, name : str, value : int) -> None:
+    with self.lock:
+      self.peaks[name] = max(self.peaks.get(name, value), value)
+
+  def to_json(self) -> Dict:
+    with self.lock:
+      return {
+        'started': self.started,
+        'finished': time.time(),
+        'phases': {phase: {'seconds': self.seconds[phase], 'calls': self.calls[phase], 'max_seconds': self.max_seconds[phase]} for phase in sorted(self.seconds)},
+        'counts': dict(sorted(self.counts.items())),
+        'peaks': dict(sorted(self.peaks.items())),
+      }
+
+  def to_prometheus(self) -> str:
+    run = self.to_json()
+    lines : List[str] = []
+
+    def metric(name : str, kind : str, description : str, label : str, values : Dict[str, float]) -> None:
+      lines.append('# HELP {}_{} {}'.format(PREFIX, name, description))
+      lines.append('# TYPE {}_{} {}'.format(PREFIX, name, kind))
+      for key, value in values.items():
+        lines.append('{}_{}{{{}="{}"}} {}'.format(PREFIX, name, label, key, repr(float(value))))
+
+    phases = run['phases']
+    metric('phase_seconds_total', 'counter', 'Time spent in each phase.', 'phase', {p: v['seconds'] for p, v in phases.items()})
+    metric('phase_calls_total', 'counter', 'Times each phase ran.', 'phase', {p: v['calls'] for p, v in phases.items()})
+    metric('phase_max_seconds', 'gauge', 'Longest single run of each phase.', 'phase', {p: v['max_seconds'] for p, v in phases.items()})
+    metric('events_total', 'counter', 'Things counted over the run.', 'name', run['counts'])
+    metric('peak', 'gauge', 'Largest size seen over the run.', 'name', run['peaks'])
+    lines.append('# HELP {}_run_start_timestamp_seconds When the run started.'.format(PREFIX))
+    lines.append('# TYPE {}_run_start_timestamp_seconds gauge'.format(PREFIX))
+    lines.append('{}_run_start_timestamp_seconds {}'.format(PREFIX, repr(run['started'])))
+    return '\n'.join(lines) + '\n'
+
+  def write(self, json_path : Optional[str] = None, prometheus_path : Optional[str] = None) -> None:
+    if json_path:
+      write_atomic(json_path, json.dumps(self.to_json(), indent=1) + '\n')
+    if prometheus_path:
+      write_atomic(prometheus_path, self.to_prometheus())
+
+
+def write_atomic(path : str, text : str) -> None:
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'w') as f:
+    f.write(text)
+  os.replace(tmp_path, path)
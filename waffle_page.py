@@ -0,0 +1,232 @@
+# Reading the waffle off the game page through selenium
+# Everything is read with a single execute_script call that returns plain JSON, instead of
+# a WebDriver round trip for every attribute of every tile
+#
+# Nothing sleeps for a fixed time, PageWaits polls for the page actually being ready (tiles
+# there, popup gone, swap animations done and the board updated) and keeps how long every
+# wait took
+#
+# The game also keeps its state (puzzle, solution, swapsRemaining, gameNumber, like
+# waffle_override.json) as json in local storage, read_state gets it in one script call
+# without looking at the tiles at all, and inject_state puts an override state there
+#
+# SwapExecutor plays a whole swap plan as one queued action sequence on element handles it
+# looks up once, then checks the board with one read at the end
+
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver import ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
+
+from waffle_metrics import Metrics
+from waffle_solver import BOARD_SIZE, NUM_TILES, TileTuple
+from waffle_swaps import Swap
+
+WAIT_TIMEOUT = 10.0
+# the popup isn't always shown, don't hold up the game long looking for it
+POPUP_TIMEOUT = 3.0
+POLL_INTERVAL = 0.05
+# where the stand-in page keeps its state and an override goes when the page has none stored
+STATE_KEY = 'waffle_state'
+# time left between queued drags on top of the tiles' transition, for the game to take the drop
+SWAP_MARGIN = 0.05
+
+T = TypeVar('T')
+
+# letter, x, y and last class of every tile, in one go
+READ_TILES_SCRIPT = '''
+return Array.from(document.querySelectorAll('.tile.draggable')).map(function (tile) {
+  var pos = JSON.parse(tile.getAttribute('data-pos'));
+  return [tile.innerText.trim(), pos.x, pos.y, tile.classList[tile.classList.length - 1]];
+});
+'''
+
+
+# true once no animation or transition is running and the tile at a data-pos has a letter
+TILE_SETTLED_SCRIPT = '''
+if (document.getAnimations && document.getAnimations().length) return false;
+var tile = document.querySelector(".tile.draggable[data-pos='" + arguments[0] + "']");
+return !!tile && tile.innerText.trim() === arguments[1];
+'''
+
+# true once every tile is green and nothing is animating
+SOLVED_SCRIPT = '''
+if (document.getAnimations && document.getAnimations().length) return false;
+var tiles = document.querySelectorAll('.tile.draggable');
+return tiles.length === arguments[0] && Array.from(tiles).every(function (tile) {
+  return tile.classList.contains('green');
+});
+'''
+
+# every tile and space element with its data-pos, and how long a tile's transition runs
+RESOLVE_SCRIPT = '''
+function byPos(selector) {
+  return Array.from(document.querySelectorAll(selector)).map(function (el) {
+    return [el.getAttribute('data-pos'), el];
+  });
+}
+var tile = document.querySelector('.tile.draggable');
+return [byPos('.tile.draggable'), byPos('.space'), tile ? getComputedStyle(tile).transitionDuration : '0s'];
+'''
+
+# key of the first stored value that looks like a game state, the live site's key isn't fixed
+FIND_STATE_JS = '''
+function findState() {
+  for (var i = 0; i < window.localStorage.length; i++) {
+    var key = window.localStorage.key(i);
+    try {
+      var value = JSON.parse(window.localStorage.getItem(key));
+    } catch (e) {
+      continue;
+    }
+    if (value && Array.isArray(value.puzzle) && Array.isArray(value.solution)) return [key, value];
+  }
+  return null;
+}
+'''
+
+READ_STATE_SCRIPT = FIND_STATE_JS + 'return findState();'
+
+# store arguments[0] under arguments[1], or under the key of the stored state, returns the key
+INJECT_STATE_SCRIPT = FIND_STATE_JS + '''
+var found = findState();
+var key = arguments[1] || (found ? found[0] : arguments[2]);
+window.localStorage.setItem(key, JSON.stringify(arguments[0]));
+return key;
+'''
+
+COUNT_TILES_SCRIPT = "return document.querySelectorAll('.tile.draggable').length;"
+
+
+# data-pos attribute of a board index, as the page writes it
+def data_pos(index : int) -> str:
+  return json.dumps({'x': index % BOARD_SIZE, 'y': index // BOARD_SIZE}, separators=(',', ':'))
+
+
+def pos_index(pos : str) -> int:
+  xy = json.loads(pos)
+  return xy['x'] + xy['y'] * BOARD_SIZE
+
+
+# longest of a css duration list like '0.3s, 150ms', in seconds
+def css_seconds(durations : str) -> float:
+  seconds = [float(d[:-2]) / 1000 if d.endswith('ms') else float(d[:-1]) for d in (d.strip() for d in durations.split(',')) if d]
+  return max(seconds, default=0.0)
+
+
+# the color class is the tile's last class, black tiles end on a tile-- modifier instead
+def tile_color(class_name : str) -> str:
+  return 'black' if 'tile--' in class_name else class_name
+
+
+# the tiles on the page as the solver's tile tuples, in one round trip
+def read_tiles(driver : WebDriver) -> List[TileTuple]:
+  return [(letter, x, y, x + y * BOARD_SIZE, tile_color(class_name)) for letter, x, y, class_name in driver.execute_script(READ_TILES_SCRIPT)]
+
+
+# the key and value of the game state in local storage, None if the page keeps none
+def read_state(driver : WebDriver) -> Optional[Tuple[str, Dict]]:
+  found = driver.execute_script(READ_STATE_SCRIPT)
+  return (found[0], found[1]) if found else None
+
+
+# store state for the page to load and reload it, returns the key it went under
+def inject_state(driver : WebDriver, state : Dict, key : Optional[str] = None) -> str:
+  key = driver.execute_script(INJECT_STATE_SCRIPT, state, key, STATE_KEY)
+  driver.refresh()
+  return key
+
+
+class PageWaits():
+  def __init__(self, driver : WebDriver, timeout : float = WAIT_TIMEOUT, metrics : Optional[Metrics] = None) -> None:
+    self.driver = driver
+    self.timeout = timeout
+    self.metrics = metrics
+    # (what was waited for, seconds) in the order the waits happened
+    self.timings : List[Tuple[str, float]] = []
+
+  # poll condition until it's truthy, raising TimeoutException after timeout seconds
+  def until(self, name : str, condition : Callable[[WebDriver], T], timeout : Optional[float] = None) -> T:
+    start = time.perf_counter()
+    try:
+      return WebDriverWait(self.driver, timeout or self.timeout, poll_frequency=POLL_INTERVAL).until(condition)
+    finally:
+      seconds = time.perf_counter() - start
+      self.timings.append((name, seconds))
+      if self.metrics is not None:
+        self.metrics.add_time('wait_' + name.replace(' ', '_'), seconds)
+
+  def tiles_present(self) -> None:
+    self.until('tiles present', lambda driver: driver.execute_script(COUNT_TILES_SCRIPT) == NUM_TILES)
+
+  # close the popup if one comes up, returns whether there was one
+  def close_popup(self) -> bool:
+    try:
+      button = self.until('popup shown', expected_conditions.element_to_be_clickable((By.CLASS_NAME, 'button--close')), POPUP_TIMEOUT)
+    except TimeoutException:
+      return False
+    button.click()
+    self.until('popup closed', expected_conditions.invisibility_of_element_located((By.CLASS_NAME, 'button--close')))
+    return True
+
+  # wait for the animation of a swap to finish with letter landing on index
+  def swap_done(self, index : int, letter : str) -> None:
+    pos = data_pos(index)
+    self.until('swap', lambda driver: driver.execute_script(TILE_SETTLED_SCRIPT, pos, letter))
+
+  def solved(self) -> None:
+    self.until('board solved', lambda driver: driver.execute_script(SOLVED_SCRIPT, NUM_TILES))
+
+  # total time spent waiting on each kind of thing, swaps added up over the game
+  def report(self) -> None:
+    totals : List[Tuple[str, float, int]] = []
+    for name, seconds in self.timings:
+      if totals and totals[-1][0] == name:
+        totals[-1] = (name, totals[-1][1] + seconds, totals[-1][2] + 1)
+      else:
+        totals.append((name, seconds, 1))
+    for name, seconds, count in totals:
+      print('Waited {:.3f}s for {}{}'.format(seconds, name, ' (x{})'.format(count) if count > 1 else ''))
+    print('Waited {:.3f}s in total'.format(sum(seconds for _, seconds in self.timings)))
+
+
+class SwapExecutor():
+  def __init__(self, driver : WebDriver, waits : Optional[PageWaits] = None) -> None:
+    self.driver = driver
+    self.waits = waits if waits is not None else PageWaits(driver)
+    self.tiles : Dict[int, WebElement] = {}
+    self.spaces : Dict[int, WebElement] = {}
+    self.swap_pause = SWAP_MARGIN
+    self.resolve()
+
+  # look every tile and space up in one script call. The game moves the same tile elements
+  # around, so after this the tiles only have to be followed along the plan, not looked up again
+  def resolve(self) -> None:
+    tiles, spaces, transition = self.driver.execute_script(RESOLVE_SCRIPT)
+    self.tiles = {pos_index(pos): element for pos, element in tiles}
+    self.spaces = {pos_index(pos): element for pos, element in spaces}
+    self.swap_pause = css_seconds(transition) + SWAP_MARGIN
+
+  # drag every swap of the plan in one action sequence, then read the board back once.
+  # letters is the board before the plan, returns whether the page ends up as the plan says
+  def perform(self, swaps : List[Swap], letters : List[Optional[str]]) -> bool:
+    letters = letters[:]
+    if swaps:
+      chain = ActionChains(self.driver)
+      for s1, s2 in swaps:
+        chain.drag_and_drop(self.tiles[s1], self.spaces[s2]).pause(self.swap_pause)
+        self.tiles[s1], self.tiles[s2] = self.tiles[s2], self.tiles[s1]
+        letters[s1], letters[s2] = letters[s2], letters[s1]
+      chain.perform()
+      s2 = swaps[-1][1]
+      self.waits.swap_done(s2, letters[s2])
+
+    on_page = {index: letter for letter, _, _, index, _ in read_tiles(self.driver)}
+    return all(on_page.get(index) == letter for index, letter in enumerate(letters) if letter)
@@ -0,0 +1,101 @@
+# Sample waffle puzzles copied off the game, with the colors it showed
+# Used by waffle_strat.py and as the sample puzzles of the benchmark corpus
+
+from typing import List
+
+from waffle_solver import TileTuple
+
+SAMPLE_BOARDS : List[List[TileTuple]] = [
+  [
+    ("C", 0, 0, 0, "green"),
+    ("L", 1, 0, 1, "black"),
+    ("E", 2, 0, 2, "yellow"),
+    ("M", 3, 0, 3, "black"),
+    ("H", 4, 0, 4, "green"),
+    ("A", 0, 1, 5, "yellow"),
+    ("V", 2, 1, 7, "yellow"),
+    ("S", 4, 1, 9, "yellow"),
+    ("S", 0, 2, 10, "yellow"),
+    ("S", 1, 2, 11, "black"),
+    ("I", 2, 2, 12, "green"),
+    ("S", 3, 2, 13, "green"),
+    ("E", 4, 2, 14, "black"),
+    ("U", 0, 3, 15, "black"),
+    ("R", 2, 3, 17, "black"),
+    ("A", 4, 3, 19, "black"),
+    ("S", 0, 4, 20, "green"),
+    ("D", 1, 4, 21, "yellow"),
+    ("K", 2, 4, 22, "black"),
+    ("R", 3, 4, 23, "black"),
+    ("Y", 4, 4, 24, "green"),
+  ],
+  [
+    ("M", 0, 0, 0, "green"),
+    ("R", 1, 0, 1, "black"),
+    ("T", 2, 0, 2, "yellow"),
+    ("E", 3, 0, 3, "yellow"),
+    ("Y", 4, 0, 4, "green"),
+    ("B", 0, 1, 5, "black"),
+    ("D", 2, 1, 7, "black"),
+    ("E", 4, 1, 9, "black"),
+    ("E", 0, 2, 10, "yellow"),
+    ("N", 1, 2, 11, "black"),
+    ("O", 2, 2, 12, "green"),
+    ("I", 3, 2, 13, "black"),
+    ("E", 4, 2, 14, "green"),
+    ("L", 0, 3, 15, "black"),
+    ("D", 2, 3, 17, "green"),
+    ("R", 4, 3, 19, "black"),
+    ("T", 0, 4, 20, "green"),
+    ("N", 1, 4, 21, "yellow"),
+    ("A", 2, 4, 22, "yellow"),
+    ("A", 3, 4, 23, "black"),
+    ("D", 4, 4, 24, "green"),
+  ],
+  [
+    ("S", 0, 0, 0, "green"),
+    ("P", 1, 0, 1, "black"),
+    ("U", 2, 0, 2, "yellow"),
+    ("D", 3, 0, 3, "black"),
+    ("Y", 4, 0, 4, "green"),
+    ("I", 0, 1, 5, "yellow"),
+    ("U", 2, 1, 7, "black"),
+    ("M", 4, 1, 9, "yellow"),
+    ("T", 0, 2, 10, "black"),
+    ("O", 1, 2, 11, "yellow"),
+    ("I", 2, 2, 12, "green"),
+    ("L", 3, 2, 13, "black"),
+    ("M", 4, 2, 14, "green"),
+    ("U", 0, 3, 15, "black"),
+    ("W", 2, 3, 17, "black"),
+    ("O", 4, 3, 19, "black"),
+    ("L", 0, 4, 20, "green"),
+    ("P", 1, 4, 21, "yellow"),
+    ("M", 2, 4, 22, "green"),
+    ("O", 3, 4, 23, "black"),
+    ("Y", 4, 4, 24, "green"),
+  ],
+  [
+    ("G", 0, 0, 0, "green"),
+    ("S", 1, 0, 1, "yellow"),
+    ("R", 2, 0, 2, "black"),
+    ("L", 3, 0, 3, "yellow"),
+    ("S", 4, 0, 4, "green"),
+    ("L", 0, 1, 5, "black"),
+    ("N", 2, 1, 7, "yellow"),
+    ("E", 4, 1, 9, "black"),
+    ("R", 0, 2, 10, "yellow"),
+    ("O", 1, 2, 11, "black"),
+    ("D", 2, 2, 12, "green"),
+    ("G", 3, 2, 13, "black"),
+    ("E", 4, 2, 14, "yellow"),
+    ("L", 0, 3, 15, "black"),
+    ("O", 2, 3, 17, "yellow"),
+    ("E", 4, 3, 19, "black"),
+    ("T", 0, 4, 20, "green"),
+    ("E", 1, 4, 21, "black"),
+    ("A", 2, 4, 22, "yellow"),
+    ("R", 3, 4, 23, "black"),
+    ("Y", 4, 4, 24, "green"),
+  ],
+]
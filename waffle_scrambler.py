@@ -0,0 +1,197 @@
+# Turn solved waffles into playable puzzles for load testing the solver and swap planner
+# Every waffle gets scrambled with a number of random swaps (10 like the game by default),
+# colored the way Waffle would color it, and written in the same shape as
+# waffle_override.json along with its colors and the fewest swaps that solve it
+#
+# Waffles are read as the grids waffle_generator.py prints or from its binary file, the
+# scrambling and coloring is done on batches of them at once in numpy, and the batches are
+# spread over processes
+#
+#   python waffle_generator.py | python waffle_scrambler.py -n 10 -o puzzles.jsonl
+#   python waffle_scrambler.py --binary waffles.bin -o puzzles.jsonl
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from waffle_colors import COLORS, HOLE, board_colors
+from waffle_generator import read_waffles as read_waffle_file
+from waffle_search import words_to_board
+from waffle_solver import BOARD_SIZE, NUM_TILES, TILE_INDEXES
+from waffle_swaps import min_swaps
+
+# the game scrambles with 10 swaps and gives 5 spare
+GAME_SWAPS = 10
+SPARE_SWAPS = 5
+# waffles handed to a worker at a time
+CHUNK_SIZE = 2000
+# rescrambles of one waffle before giving up on hitting exactly the asked for swap count
+MAX_TRIES = 20
+
+
+# the 21 letters of every waffle in the generator's printed output
+def read_waffles(lines : Iterable[str]) -> Iterator[str]:
+  rows : List[str] = []
+  for line in lines:
+    line = line.rstrip('\n')
+    if not line.strip():
+      continue
+    rows.append(line.ljust(BOARD_SIZE))
+    if len(rows) == BOARD_SIZE:
+      yield ''.join(rows[i // BOARD_SIZE][i % BOARD_SIZE] for i in TILE_INDEXES).upper()
+      rows = []
+
+
+# the 21 letters of every waffle in a binary file from waffle_generator.py
+def read_binary_waffles(path : str) -> Iterator[str]:
+  for words in read_waffle_file(path):
+    yield ''.join(letter for letter in words_to_board(words) if letter)
+
+
+def encode_tiles(waffles : List[str]) -> np.ndarray:
+  return np.frombuffer(''.join(waffles).encode('ascii'), dtype=np.uint8).reshape(-1, NUM_TILES) - ord('A')
+
+
+# the tiles of every waffle laid out on the full board, holes included
+def tiles_to_boards(tiles : np.ndarray) -> np.ndarray:
+  boards = np.full((len(tiles), BOARD_SIZE * BOARD_SIZE), HOLE, dtype=np.uint8)
+  boards[:, TILE_INDEXES] = tiles
+  return boards
+
+
+# swap two different random tiles of every waffle, swaps times over
+def scramble(tiles : np.ndarray, swaps : int, rng : np.random.Generator) -> np.ndarray:
+  tiles = tiles.copy()
+  rows = np.arange(len(tiles))
+  for _ in range(swaps):
+    i = rng.integers(NUM_TILES, size=len(tiles))
+    j = (i + rng.integers(1, NUM_TILES, size=len(tiles))) % NUM_TILES
+    tiles[rows, i], tiles[rows, j] = tiles[rows, j], tiles[rows, i]
+  return tiles
+
+
+# move tiles around random cycles whose lengths less one add up to swaps, that takes exactly
+# swaps swaps to undo unless duplicate letters give a shortcut
+def scramble_cycles(tiles : np.ndarray, swaps : int, rng : np.random.Generator) -> np.ndarray:
+  assert(0 < swaps < NUM_TILES)
+  tiles = tiles.copy()
+  for row in tiles:
+    num_cycles = rng.integers(1, min(swaps, NUM_TILES - swaps) + 1)
+    spaces = rng.permutation(NUM_TILES)[:swaps + num_cycles]
+    lengths = rng.multinomial(swaps - num_cycles, np.full(num_cycles, 1 / num_cycles)) + 2
+    start = 0
+    for length in lengths:
+      cycle = spaces[start:start + length]
+      row[cycle] = row[np.roll(cycle, 1)]
+      start += length
+  return tiles
+
+
+def fewest_swaps(puzzles : np.ndarray, solutions : np.ndarray) -> List[int]:
+  letters = [''.join(chr(ord('A') + c) for c in row) for row in np.concatenate([puzzles, solutions], axis=1).tolist()]
+  return [min_swaps(list(row[:NUM_TILES]), list(row[NUM_TILES:])) for row in letters]
+
+
+# scrambled puzzles for a batch of waffles. With exact, the tiles are moved around cycles instead
+# of swapped at random, and waffles whose duplicate letters still let the scramble be undone
+# in fewer swaps get scrambled again
+def scramble_waffles(waffles : List[str], swaps : int, rng : np.random.Generator, exact : bool = False) -> List[Dict]:
+  if not waffles:
+    return []
+  solutions = encode_tiles(waffles)
+  puzzles = scramble_cycles(solutions, swaps, rng) if exact else scramble(solutions, swaps, rng)
+  fewest = np.array(fewest_swaps(puzzles, solutions))
+
+  if exact:
+    for _ in range(MAX_TRIES):
+      redo = np.flatnonzero(fewest != swaps)
+      if not len(redo):
+        break
+      puzzles[redo] = scramble_cycles(solutions[redo], swaps, rng)
+      fewest[redo] = fewest_swaps(puzzles[redo], solutions[redo])
+
+  colors = board_colors(tiles_to_boards(solutions), tiles_to_boards(puzzles))[:, TILE_INDEXES]
+  results : List[Dict] = []
+  for waffle, puzzle, color_row, count in zip(waffles, puzzles.tolist(), colors.tolist(), fewest.tolist()):
+    if exact and count != swaps:
+      continue
+    results.append({
+      'solution': list(waffle),
+      'puzzle': [chr(ord('A') + c) for c in puzzle],
+      'colors': [COLORS[c] for c in color_row],
+      'minSwaps': count,
+      'swapsRemaining': count + SPARE_SWAPS,
+    })
+  return results
+
+
+def scramble_chunk(job : Tuple[int, List[str], int, int, int, bool]) -> List[str]:
+  index, waffles, copies, swaps, seed, exact = job
+  # every chunk gets its own stream so the output doesn't depend on the number of workers
+  rng = np.random.default_rng([seed, index])
+  # number the puzzles so batch results can be matched back up. Every chunk numbers from where
+  # it would start if no puzzle was dropped, so with exact the numbers can have gaps
+  game_number = index * CHUNK_SIZE * copies
+  lines : List[str] = []
+  for _ in range(copies):
+    for puzzle in scramble_waffles(waffles, swaps, rng, exact):
+      lines.append(json.dumps(dict({'gameNumber': game_number}, **puzzle)))
+      game_number += 1
+  return lines
+
+
+def read_chunks(waffles : Iterator[str], copies : int, swaps : int, seed : int, exact : bool) -> Iterator[Tuple[int, List[str], int, int, int, bool]]:
+  chunk : List[str] = []
+  index = 0
+  for waffle in waffles:
+    chunk.append(waffle)
+    if len(chunk) == CHUNK_SIZE:
+      yield index, chunk, copies, swaps, seed, exact
+      chunk = []
+      index += 1
+  if chunk:
+    yield index, chunk, copies, swaps, seed, exact
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Scramble solved waffles into colored puzzles')
+  parser.add_argument('input', nargs='?', default='-', help="waffle_generator.py's printed output (- for stdin)")
+  parser.add_argument('--binary', default=None, help='read waffles from a binary file of waffle_generator.py instead')
+  parser.add_argument('-o', '--output', default='-', help='puzzles, one json per line (- for stdout)')
+  parser.add_argument('-n', '--swaps', type=int, default=GAME_SWAPS, help='swaps to scramble with')
+  parser.add_argument('--exact', action='store_true', help='only keep puzzles that take exactly that many swaps to solve')
+  parser.add_argument('--copies', type=int, default=1, help='differently scrambled puzzles per waffle')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('-w', '--workers', type=int, default=multiprocessing.cpu_count())
+  args = parser.parse_args()
+
+  source = sys.stdin if args.input == '-' or args.binary else open(args.input)
+  sink = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+  start = time.perf_counter()
+  total = 0
+  waffles = read_binary_waffles(args.binary) if args.binary else read_waffles(source)
+  jobs = read_chunks(waffles, args.copies, args.swaps, args.seed, args.exact)
+  with multiprocessing.Pool(args.workers) as pool:
+    for lines in pool.imap(scramble_chunk, jobs):
+      for line in lines:
+        sink.write(line + '\n')
+      total += len(lines)
+  elapsed = time.perf_counter() - start
+
+  print('Wrote {} puzzles in {:.2f}s, {:.0f} puzzles/sec with {} workers'.format(
+    total, elapsed, total / elapsed if elapsed else 0.0, args.workers), file=sys.stderr)
+
+  if source is not sys.stdin:
+    source.close()
+  if sink is not sys.stdout:
+    sink.close()
+
+
+if __name__ == '__main__':
+  main()
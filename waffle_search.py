@@ -0,0 +1,140 @@
+# Backtracking search for the six words of a waffle
+# Words are placed one slot at a time, most constrained slot first, and a branch
+# is dropped as soon as one of its intersection letters can't be matched or it
+# uses more of a letter than the board has tiles for
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+BOARD_SIZE = 5
+NUM_WORDS = (BOARD_SIZE // 2 + 1) * 2
+
+'''
+Slots are enumerated rows first and then columns (same as Board.words)
+
+  0 0 0 0 0
+  3 _ 4 _ 5
+  1 1 1 1 1
+  3 _ 4 _ 5
+  2 2 2 2 2
+
+Row slot i at position 2 * j crosses column slot j + 3 at position 2 * i
+'''
+
+# for every slot, the (position in slot, crossing slot, position in crossing slot) triples
+CROSSINGS : List[List[Tuple[int, int, int]]] = [[] for _ in range(NUM_WORDS)]
+for i in range(NUM_WORDS // 2):
+  for j in range(NUM_WORDS // 2):
+    CROSSINGS[i].append((2 * j, j + NUM_WORDS // 2, 2 * i))
+    CROSSINGS[j + NUM_WORDS // 2].append((2 * i, i, 2 * j))
+
+# board index of every letter of every slot
+SLOT_SPACES : List[List[int]] = []
+for i in range(NUM_WORDS // 2):
+  SLOT_SPACES.append([2 * i * BOARD_SIZE + j for j in range(BOARD_SIZE)])
+for i in range(NUM_WORDS // 2):
+  SLOT_SPACES.append([j * BOARD_SIZE + 2 * i for j in range(BOARD_SIZE)])
+
+PositionIndex = Dict[Tuple[int, str], Set[str]]
+
+
+# lay the six words out on the board, None for the holes
+def words_to_board(words : List[str]) -> List[Optional[str]]:
+  board : List[Optional[str]] = [None] * (BOARD_SIZE * BOARD_SIZE)
+  for word, spaces in zip(words, SLOT_SPACES):
+    for letter, idx in zip(word, spaces):
+      assert(board[idx] is None or board[idx] == letter)
+      board[idx] = letter
+  return board
+
+
+# count of each letter A-Z, e.g. the tiles on the board
+def letter_budget(letters : Iterable[str]) -> List[int]:
+  budget = [0] * 26
+  for letter in letters:
+    budget[ord(letter) - ord('A')] += 1
+  return budget
+
+
+# map (position, letter) to the set of words with that letter in that position
+def build_position_index(words : List[str]) -> PositionIndex:
+  index : PositionIndex = {}
+  for word in words:
+    for pos, letter in enumerate(word):
+      if (pos, letter) not in index:
+        index[(pos, letter)] = set()
+      index[(pos, letter)].add(word)
+  return index
+
+
+class WaffleSearch():
+  def __init__(self, possible_answers : List[List[str]], budget : Optional[List[int]] = None) -> None:
+    assert(len(possible_answers) == NUM_WORDS)
+    self.candidates : List[Set[str]] = [set(answers) for answers in possible_answers]
+    self.indexes : List[PositionIndex] = [build_position_index(answers) for answers in possible_answers]
+    # letters left to place, a letter at an intersection is only drawn by the first word placed on it
+    self.budget = budget[:] if budget is not None else None
+    self.nodes = 0
+
+  # letters a word would draw from the budget, or None if it would overdraw one
+  def draw(self, slot : int, word : str, assignment : List[Optional[str]]) -> Optional[List[int]]:
+    if self.budget is None:
+      return []
+    shared = [pos for pos, other, _ in CROSSINGS[slot] if assignment[other] is not None]
+    drawn : List[int] = []
+    for pos, letter in enumerate(word):
+      if pos in shared:
+        continue
+      c = ord(letter) - ord('A')
+      drawn.append(c)
+      if drawn.count(c) > self.budget[c]:
+        return None
+    return drawn
+
+  # words of a slot that agree with every crossing slot that has already been placed
+  def compatible(self, slot : int, assignment : List[Optional[str]]) -> Set[str]:
+    constraints : List[Set[str]] = []
+    for pos, other, other_pos in CROSSINGS[slot]:
+      placed = assignment[other]
+      if placed is None:
+        continue
+      constraints.append(self.indexes[slot].get((pos, placed[other_pos]), set()))
+    if not constraints:
+      return self.candidates[slot]
+    constraints.sort(key=len)
+    return constraints[0].intersection(*constraints[1:])
+
+  def solutions(self) -> Iterator[List[str]]:
+    assignment : List[Optional[str]] = [None] * NUM_WORDS
+    yield from self._search(assignment)
+
+  def _search(self, assignment : List[Optional[str]]) -> Iterator[List[str]]:
+    self.nodes += 1
+
+    # pick the open slot with the fewest compatible words, dead end if any slot has none
+    best_slot : Optional[int] = None
+    best_words : Set[str] = set()
+    for slot in range(NUM_WORDS):
+      if assignment[slot] is not None:
+        continue
+      words = self.compatible(slot, assignment)
+      if self.budget is not None:
+        words = set(word for word in words if self.draw(slot, word, assignment) is not None)
+      if not words:
+        return
+      if best_slot is None or len(words) < len(best_words):
+        best_slot, best_words = slot, words
+
+    if best_slot is None:
+      yield list(assignment)
+      return
+
+    for word in sorted(best_words):
+      drawn = self.draw(best_slot, word, assignment)
+      assert(drawn is not None)
+      for c in drawn:
+        self.budget[c] -= 1
+      assignment[best_slot] = word
+      yield from self._search(assignment)
+      assignment[best_slot] = None
+      for c in drawn:
+        self.budget[c] += 1
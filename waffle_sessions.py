@@ -0,0 +1,138 @@
+# Pool of warm browser sessions for playing games back to back
+# Starting Chrome and loading the site cold takes longer than solving and playing a game, so
+# sessions are started once, handed out to games and only reset before each one: storage is
+# cleared and the page reloaded from the browser's cache. A session is quit and started over
+# after a number of games or as soon as a game on it fails
+#
+# Every session gets its own profile directory that is kept between runs, Chrome locks a
+# profile to one browser at a time and the cached assets stay warm for the next run
+#
+#   with SessionPool(4) as pool:
+#     results = pool.run(20, play_game)
+
+import os
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+from selenium import webdriver
+from selenium.webdriver.remote.webdriver import WebDriver
+
+SITE_URL = 'https://wafflegame.net/'
+PROFILE_DIR = 'chrome_profiles'
+# games on a session before it's quit and started over, browsers get slower the longer they run
+MAX_USES = 25
+
+# forget the game played so the page deals a fresh board on reload
+RESET_SCRIPT = 'window.localStorage.clear(); window.sessionStorage.clear();'
+
+T = TypeVar('T')
+
+
+def new_driver(profile_dir : str, headless : bool = True) -> WebDriver:
+  options = webdriver.ChromeOptions()
+  if headless:
+    options.add_argument('--headless=new')
+  options.add_argument('--user-data-dir={}'.format(os.path.abspath(profile_dir)))
+  options.add_argument('--window-size=1280,1024')
+  return webdriver.Chrome(options=options)
+
+
+class Session():
+  def __init__(self, slot : int, driver : WebDriver) -> None:
+    self.slot = slot
+    self.driver = driver
+    self.uses = 0
+    self.broken = False
+
+
+class SessionPool():
+  def __init__(self, size : int, url : str = SITE_URL, profile_dir : str = PROFILE_DIR, headless : bool = True, max_uses : int = MAX_USES) -> None:
+    self.size = size
+    self.url = url
+    self.profile_dir = profile_dir
+    self.headless = headless
+    self.max_uses = max_uses
+    # started sessions by slot, a slot without one gets a new session when it's next handed out
+    self.sessions : Dict[int, Session] = {}
+    self.idle : 'queue.Queue[int]' = queue.Queue()
+    self.lock = threading.Lock()
+    self.started = 0
+    self.recycled = 0
+    for slot in range(size):
+      self.idle.put(slot)
+
+  def __enter__(self) -> 'SessionPool':
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.close()
+
+  def start(self, slot : int) -> Session:
+    driver = new_driver(os.path.join(self.profile_dir, 'session-{}'.format(slot)), self.headless)
+    try:
+      driver.get(self.url)
+    except Exception:
+      driver.quit()
+      raise
+    with self.lock:
+      self.sessions[slot] = Session(slot, driver)
+      self.started += 1
+      return self.sessions[slot]
+
+  # start every session up front, in parallel, so the first games don't pay for it
+  def warm(self) -> None:
+    missing = [slot for slot in range(self.size) if slot not in self.sessions]
+    with ThreadPoolExecutor(len(missing) or 1) as executor:
+      list(executor.map(self.start, missing))
+
+  def recycle(self, session : Session) -> None:
+    with self.lock:
+      del self.sessions[session.slot]
+      self.recycled += 1
+    try:
+      session.driver.quit()
+    except Exception:
+      pass
+
+  # a session to play one game on, the page loaded and reset to a fresh game
+  @contextmanager
+  def session(self) -> Iterator[WebDriver]:
+    slot = self.idle.get()
+    try:
+      session = self.sessions.get(slot) or self.start(slot)
+      try:
+        # a fresh session too, the profile it started on keeps the last run's storage
+        session.driver.execute_script(RESET_SCRIPT)
+        session.driver.get(self.url)
+        yield session.driver
+      except BaseException:
+        session.broken = True
+        raise
+      finally:
+        session.uses += 1
+        if session.broken or session.uses >= self.max_uses:
+          self.recycle(session)
+    finally:
+      self.idle.put(slot)
+
+  def play(self, game : Callable[[WebDriver], T]) -> Optional[T]:
+    try:
+      with self.session() as driver:
+        return game(driver)
+    except Exception:
+      traceback.print_exc(file=sys.stderr)
+      return None
+
+  # play games games, as many at once as there are sessions. A game that raised is None
+  def run(self, games : int, game : Callable[[WebDriver], T]) -> List[Optional[T]]:
+    with ThreadPoolExecutor(self.size) as executor:
+      return list(executor.map(lambda _: self.play(game), range(games)))
+
+  def close(self) -> None:
+    for session in list(self.sessions.values()):
+      self.recycle(session)
@@ -0,0 +1,406 @@
+# Waffle solving strategy as a library, nothing runs at import time
+# First try to figure out the six words used in the waffle
+# Then determine the optimal swaps to solve the waffle
+
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from waffle_colors import matching_solutions, matching_words
+from waffle_db import SolutionDB
+from waffle_metrics import Metrics
+from waffle_search import WaffleSearch, letter_budget, words_to_board
+from waffle_swaps import Swap, SwapSearch, apply_swaps, plan_swaps
+from waffle_words import WORDS_PATH, WordMatrix, load_word_matrix
+
+BOARD_SIZE = 5
+NUM_TILES = BOARD_SIZE * BOARD_SIZE - (BOARD_SIZE // 2) * (BOARD_SIZE // 2)
+NUM_WORDS = (BOARD_SIZE // 2 + 1) * 2
+
+# letter, x, y, index, color
+TileTuple = Tuple[str, int, int, int, str]
+
+# board index of every tile, in the order the game lists them (rows top to bottom)
+TILE_INDEXES = [i for i in range(BOARD_SIZE * BOARD_SIZE) if not ((i // BOARD_SIZE) % 2 and (i % BOARD_SIZE) % 2)]
+
+
+# Print text in color, helps with debugging
+def colored(color : str, text : str) -> str:
+  if color == 'green':
+    r, g, b = 0, 255, 0
+  elif color == 'yellow':
+    r, g, b = 255, 255, 0
+  else:
+    r, g, b = 255, 255, 255
+  return "\033[38;2;{};{};{}m{}\033[38;2;255;255;255m".format(r, g, b, text)
+
+
+class Tile():
+  def __init__(self, letter : str, x : int, y : int, index : int, color : str) -> None:
+    self.letter = letter
+    self.x = x
+    self.y = y
+    self.index = index
+    self.color = color
+    self.words : List[Word] = []
+    self.space : Optional[Space] = None
+
+  def __str__(self) -> str:
+    return colored(self.color, self.letter)
+
+
+class Space():
+  def __init__(self, index : int, possible_letters : Set[str]) -> None:
+    self.index = index
+    self.possible_letters = possible_letters
+    self.impossible_letters = set()
+    self.tile : Optional[Tile] = None
+
+  def add_impossible(self, letter : str) -> None:
+    if letter in self.possible_letters:
+      self.possible_letters.remove(letter)
+    self.impossible_letters.add(letter)
+
+  def add_impossibles(self, letters : Set[str]) -> None:
+    self.possible_letters.difference_update(letters)
+    self.impossible_letters = self.impossible_letters.union(letters)
+
+  def __str__(self) -> str:
+    return 'Possible letters for space {}: '.format(self.index) + ' '.join(sorted(list(self.possible_letters)))
+
+
+class Word():
+  def __init__(self, letters : List[Tile]) -> None:
+    self.letters = letters
+    self.known_letters : List[str] = []
+    # most copies of a letter the word can have, for letters we know a limit of
+    self.max_letters : Dict[str, int] = {}
+    self.possible_answers : List[str] = []
+
+  def __str__(self) -> str:
+    word = ''
+    for letter in self.letters:
+      word += str(letter)
+    return word
+
+
+'''
+Example board is like the following:
+
+  A B C D E
+  F _ G _ H
+  I J K L M
+  N _ O _ P
+  Q R S T U
+
+words are enumerated rows first and then columns
+word 1: ABCDE
+word 2: IJKLM
+word 3: QRSTU
+word 4: AFINQ
+word 5: CGKOS
+word 6: EHMPU
+'''
+
+class Board():
+  def __init__(self, tiles : List[TileTuple]) -> None:
+    self.board : List[Optional[Tile]] = [None] * (BOARD_SIZE * BOARD_SIZE)
+    self.all_possible_letters : Set[str] = set()
+    self.letter_to_tile : Dict[str, List[Tile]] = {}
+    for text, x, y, index, color in tiles:
+      t = Tile(text, x, y, index, color)
+      self.board[t.index] = t
+      self.all_possible_letters.add(t.letter)
+      if t.letter not in self.letter_to_tile:
+        self.letter_to_tile[t.letter] = []
+      self.letter_to_tile[t.letter].append(t)
+
+    self.spaces : List[Optional[Space]] = [None] * (BOARD_SIZE * BOARD_SIZE)
+    for i in range(BOARD_SIZE):
+      for j in range(BOARD_SIZE):
+        if i % 2 and j % 2:
+          continue
+        idx = i * BOARD_SIZE + j
+        self.spaces[idx] = Space(idx, self.all_possible_letters.copy())
+        self.board[idx].space = self.spaces[idx]
+        self.spaces[idx].tile = self.board[idx]
+
+    self.words : List[Optional[Word]] = [None] * NUM_WORDS
+    for i in range(0, NUM_WORDS, 2):
+      letters : List[Tile] = []
+      for j in range(BOARD_SIZE):
+        letters.append(self.board[i * BOARD_SIZE + j])
+      word = Word(letters)
+      self.words[i // 2] = word
+      for letter in letters:
+        letter.words.append(word)
+    for i in range(0, NUM_WORDS, 2):
+      letters = []
+      for j in range(BOARD_SIZE):
+        letters.append(self.board[j * BOARD_SIZE + i])
+      word = Word(letters)
+      self.words[i // 2 + NUM_WORDS // 2] = word
+      for letter in letters:
+        letter.words.append(word)
+
+    # how far along WaffleSolver got with this board
+    self.propagated = False
+    self.candidates : Optional[List[List[str]]] = None
+    self.solutions : Optional[List[List[str]]] = None
+    self.search_nodes = 0
+    # whether the solutions came out of the solution database or the search
+    self.solution_source : Optional[str] = None
+
+  # letters of the scrambled board, None for the holes
+  def letters(self) -> List[Optional[str]]:
+    return [t.letter if t else None for t in self.board]
+
+  def colors(self) -> List[Optional[str]]:
+    return [t.color if t else None for t in self.board]
+
+  def print_board(self):
+    for i in range(BOARD_SIZE):
+      for j in range(BOARD_SIZE):
+        if self.board[i * BOARD_SIZE + j]:
+          print(self.board[i * BOARD_SIZE + j], end='')
+        else:
+          print(' ', end='')
+      print()
+
+  def print_possible_letters(self):
+    for space in self.spaces:
+      if space:
+        print(space)
+
+
+BoardInput = Union[Board, List[TileTuple]]
+
+
+# tile tuples from the 21 letters and colors of a board, listed rows top to bottom
+def tiles_from_puzzle(letters : List[str], colors : List[str]) -> List[TileTuple]:
+  assert(len(letters) == NUM_TILES and len(colors) == NUM_TILES)
+  return [(letter, idx % BOARD_SIZE, idx // BOARD_SIZE, idx, color) for letter, color, idx in zip(letters, colors, TILE_INDEXES)]
+
+
+def solve(board : Board, tile : Tile) -> None:
+  space = tile.space
+
+  if tile.color == 'green':
+    # set all other letters to impossible
+    space.add_impossibles(space.possible_letters.difference(set([tile.letter])))
+
+    # if all instances of this letter are solved, remove this letter from the possible letters of all other spaces
+    if all([t.color == 'green' for t in board.letter_to_tile[tile.letter]]):
+      for t in board.board:
+        if t and t.letter != tile.letter:
+          t.space.add_impossible(tile.letter)
+
+  else:
+    # this space cannot be this letter
+    space.add_impossible(tile.letter)
+
+  # Remove yellow letters from all letters NOT in its words if it's the only one
+  # on the whole board...
+  if tile.color == 'yellow':
+    tiles = board.letter_to_tile[tile.letter]
+    if len(tiles) == 1:
+      current_letters = set()
+      for word in tile.words:
+        for letter in word.letters:
+          current_letters.add(letter)
+      for t in board.board:
+        if t and t not in current_letters and t.color != 'green':
+          t.space.add_impossible(tile.letter)
+
+# Count how many of each letter a word has from the colors of its tiles, this is what makes
+# duplicate letters work. Like wordle, a word hands out yellows to its non green tiles of a
+# letter in order, one for every copy of the letter in the word's non green spaces. So a tile
+# that's yellow because of this word at position k (among the non green tiles of its letter)
+# means at least k + 1 copies, and the first black one at position k means at most k copies.
+# An intersection tile that's yellow might be yellow because of its other word, so it doesn't
+# tell us anything about this one
+def solve_word(word : Word) -> None:
+  for letter in sorted(set(t.letter for t in word.letters)):
+    greens = sum(1 for t in word.letters if t.letter == letter and t.color == 'green')
+    others = [t for t in word.letters if t.letter == letter and t.color != 'green']
+    at_least = 0
+    at_most : Optional[int] = None
+    for k, t in enumerate(others):
+      if t.color == 'black':
+        at_most = k
+        break
+      if len(t.words) == 1:
+        at_least = k + 1
+
+    # known letters holds every copy we know of, greens included
+    word.known_letters.extend([letter] * (greens + at_least))
+    if at_most is not None:
+      word.max_letters[letter] = greens + at_most
+
+# The board has a fixed number of tiles of each letter. The rows hold all of them but the
+# column-only tiles, so a row can't have more copies of a letter than the board has minus
+# what the other rows need at least. Same for the columns
+def solve_letter_counts(board : Board) -> None:
+  for letter, tiles in board.letter_to_tile.items():
+    for words in (board.words[:NUM_WORDS // 2], board.words[NUM_WORDS // 2:]):
+      spare = len(tiles) - sum(word.known_letters.count(letter) for word in words)
+      for word in words:
+        at_most = word.known_letters.count(letter) + spare
+        if at_most < word.max_letters.get(letter, BOARD_SIZE):
+          word.max_letters[letter] = at_most
+
+# if the greens of a word already use up every copy of a letter it can have, none of its
+# other spaces can be that letter
+def solve_max_letters(word : Word) -> None:
+  for letter, at_most in word.max_letters.items():
+    greens = sum(1 for t in word.letters if t.letter == letter and t.color == 'green')
+    if at_most <= greens:
+      for t in word.letters:
+        if t.color != 'green':
+          t.space.add_impossible(letter)
+
+# narrow down the possible letters of every space and the letter counts of every word
+def propagate(board : Board) -> None:
+  for tile in board.board:
+    if tile:
+      solve(board, tile)
+  for word in board.words:
+    solve_word(word)
+  solve_letter_counts(board)
+  for word in board.words:
+    solve_max_letters(word)
+
+# Solver built once from a dictionary and reused for any number of boards. Every method
+# takes either a Board or plain tile tuples, and runs whatever earlier phase the board
+# hasn't been through yet. Every phase that runs is added to metrics
+class WaffleSolver():
+  def __init__(self, word_matrix : Optional[WordMatrix] = None, words_path : str = WORDS_PATH, solution_db : Optional[SolutionDB] = None, metrics : Optional[Metrics] = None) -> None:
+    self.word_matrix = word_matrix if word_matrix is not None else load_word_matrix(words_path)
+    self.solution_db = solution_db
+    self.metrics = metrics if metrics is not None else Metrics()
+
+  def board(self, board : BoardInput) -> Board:
+    return board if isinstance(board, Board) else Board(board)
+
+  # narrow down the possible letters of every space and the letter counts of every word
+  def propagate(self, board : BoardInput) -> Board:
+    board = self.board(board)
+    if not board.propagated:
+      with self.metrics.time('propagate'):
+        propagate(board)
+      board.propagated = True
+      self.metrics.count('boards')
+    return board
+
+  # cross reference wordle words with constraints on board, all six words filtered in one batch
+  def candidates(self, board : BoardInput) -> List[List[str]]:
+    board = self.propagate(board)
+    if board.candidates is None:
+      with self.metrics.time('candidates'):
+        puzzle, puzzle_colors = board.letters(), board.colors()
+        slot_constraints = [([t.space.possible_letters for t in word.letters], word.known_letters, word.max_letters) for word in board.words]
+        for slot, (word, possible_answers) in enumerate(zip(board.words, self.word_matrix.filter_slots(slot_constraints))):
+          # drop words that would color their own tiles differently from the board
+          matches = matching_words(slot, possible_answers, puzzle, puzzle_colors)
+          word.possible_answers = [real_word for real_word, match in zip(possible_answers, matches) if match]
+        board.candidates = [word.possible_answers for word in board.words]
+      self.metrics.count('candidates', sum(len(c) for c in board.candidates))
+      self.metrics.peak('word_candidates', max(len(c) for c in board.candidates))
+    return board.candidates
+
+  # look the board up in the solution database, if there is one. Leaves the board unsolved on a miss
+  def lookup(self, board : BoardInput) -> Board:
+    board = self.board(board)
+    if board.solutions is None and self.solution_db is not None:
+      with self.metrics.time('lookup'):
+        answer = self.solution_db.lookup(board.letters(), board.colors())
+      self.metrics.count('lookup_hits' if answer else 'lookup_misses')
+      if answer:
+        board.solutions = answer
+        board.solution_source = 'database'
+    return board
+
+  # every waffle that fits the candidates, uses exactly the board's tiles and gives back its colors
+  def solutions(self, board : BoardInput) -> List[List[str]]:
+    board = self.lookup(board)
+    if board.solutions is None:
+      candidates = self.candidates(board)
+      board.solution_source = 'search'
+      board.solutions = []
+      if all(candidates):
+        with self.metrics.time('solutions'):
+          # the board's tiles are the letter budget, any partial waffle that overdraws a letter is dropped
+          budget = letter_budget(t.letter for t in board.board if t)
+          search = WaffleSearch(candidates, budget)
+          answer = list(search.solutions())
+          board.search_nodes = search.nodes
+          # only waffles that give back exactly the colors on the board can be the answer
+          board.solutions = [words for words, match in zip(answer, matching_solutions(answer, board.letters(), board.colors())) if match]
+      self.metrics.count('search_nodes', board.search_nodes)
+      self.metrics.peak('board_search_nodes', board.search_nodes)
+      self.metrics.peak('board_solutions', len(board.solutions))
+    return board.solutions
+
+  # fewest swaps from the scrambled board to a solution
+  def plan_swaps(self, board : BoardInput, solution : List[str]) -> List[Swap]:
+    board = self.board(board)
+    current_waffle = board.letters()
+    correct_waffle = words_to_board(solution)
+    with self.metrics.time('swaps'):
+      swaps = plan_swaps(current_waffle, correct_waffle)
+    assert(apply_swaps(current_waffle, swaps) == correct_waffle)
+    self.metrics.count('swaps', len(swaps))
+    self.metrics.peak('board_swaps', len(swaps))
+    return swaps
+
+  # fewest swaps by A* over boards instead, to cross check the planner. None if it gave up
+  def search_swaps(self, board : BoardInput, solution : List[str], max_nodes : int = 200000) -> Tuple[Optional[List[Swap]], SwapSearch]:
+    board = self.board(board)
+    search = SwapSearch(words_to_board(solution), max_nodes=max_nodes)
+    with self.metrics.time('swap_search'):
+      swaps = search.search(board.letters())
+    self.metrics.count('swap_search_nodes', search.nodes)
+    self.metrics.count('swap_search_gave_up', int(search.limit_hit is not None))
+    self.metrics.peak('swap_search_states', search.states)
+    self.metrics.peak('swap_search_queue', search.max_queue)
+    return swaps, search
+
+  # run every phase on a board, with how long each one took. A board found in the solution
+  # database skips straight to planning the swaps
+  def solve(self, board : BoardInput) -> Dict:
+    timings : Dict[str, float] = {}
+    start = time.perf_counter()
+
+    board = self.lookup(board)
+    if self.solution_db is not None:
+      timings['lookup'] = time.perf_counter() - start
+
+    candidates : Optional[List[List[str]]] = None
+    if board.solutions is None:
+      last = time.perf_counter()
+      self.propagate(board)
+      timings['propagate'] = time.perf_counter() - last
+
+      last = time.perf_counter()
+      candidates = self.candidates(board)
+      timings['candidates'] = time.perf_counter() - last
+
+    last = time.perf_counter()
+    answer = self.solutions(board)
+    timings['solutions'] = time.perf_counter() - last
+
+    result : Dict = {
+      'words': answer[0] if answer else None,
+      'num_solutions': len(answer),
+      'num_candidates': [len(c) for c in candidates] if candidates is not None else None,
+      'search_nodes': board.search_nodes,
+      'source': board.solution_source,
+      'swaps': None,
+    }
+    if answer:
+      last = time.perf_counter()
+      result['swaps'] = self.plan_swaps(board, answer[0])
+      timings['swaps'] = time.perf_counter() - last
+
+    timings['total'] = time.perf_counter() - start
+    result['timings'] = timings
+    return result
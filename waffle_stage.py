@@ -0,0 +1,157 @@
+# Local stand-in for wafflegame.net, so the whole scrape, solve and swap path can be run and
+# timed without the network
+# Serves waffle_stage.html, a page with the game's DOM, and hands it puzzles in the shape of
+# waffle_override.json (or the lines of waffle_scrambler.py's output) in order, one per page
+# load. /?game=N always loads puzzle N instead, counting from 0
+#
+#   python waffle_stage.py puzzles.jsonl                      serve on localhost:8130
+#   python waffle_stage.py puzzles.jsonl --play 20 -s 4       also play 20 games on it and time them
+#   python waffle_stage.py puzzles.jsonl --play 20 --ingest state
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from waffle import metrics, play_game
+from waffle_scrambler import GAME_SWAPS, SPARE_SWAPS
+from waffle_sessions import SessionPool
+
+STAGE_PORT = 8130
+PAGE_PATH = 'waffle_stage.html'
+# about how long the game's tiles take to slide into place
+SWAP_MS = 300
+
+
+# puzzles of json files holding one, or json lines files holding one per line
+def read_puzzles(paths : List[str]) -> List[Dict]:
+  puzzles : List[Dict] = []
+  for path in paths:
+    with open(path) as f:
+      if path.endswith('.jsonl'):
+        puzzles.extend(json.loads(line) for line in f if line.strip())
+      else:
+        puzzles.append(json.load(f))
+  for k, puzzle in enumerate(puzzles):
+    puzzle.setdefault('gameNumber', k)
+    puzzle.setdefault('swapsRemaining', puzzle.get('minSwaps', GAME_SWAPS) + SPARE_SWAPS)
+  return puzzles
+
+
+class StageHandler(BaseHTTPRequestHandler):
+  def reply(self, body : bytes, content_type : str, status : int = 200) -> None:
+    self.send_response(status)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('Cache-Control', 'no-store')
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self) -> None:
+    url = urlparse(self.path)
+    if url.path == '/':
+      self.reply(self.server.page, 'text/html; charset=utf-8')
+    elif url.path == '/puzzle.json':
+      game = parse_qs(url.query).get('game')
+      try:
+        index = int(game[0]) if game else None
+      except ValueError:
+        index = -1
+      if index is not None and not 0 <= index < len(self.server.puzzles):
+        self.send_error(400, 'game needs to be a puzzle number from 0 to {}'.format(len(self.server.puzzles) - 1))
+        return
+      puzzle = self.server.next_puzzle(index)
+      self.reply(json.dumps(dict(puzzle, swapMs=self.server.swap_ms)).encode('utf-8'), 'application/json')
+    else:
+      self.reply(b'not found', 'text/plain', 404)
+
+  # keep the request log out of the way
+  def log_message(self, format : str, *args) -> None:
+    pass
+
+
+class StageServer(ThreadingHTTPServer):
+  daemon_threads = True
+
+  def __init__(self, puzzles : List[Dict], port : int = STAGE_PORT, swap_ms : int = SWAP_MS) -> None:
+    super().__init__(('127.0.0.1', port), StageHandler)
+    with open(PAGE_PATH, 'rb') as f:
+      self.page = f.read()
+    self.puzzles = puzzles
+    self.swap_ms = swap_ms
+    self.served = 0
+    self.lock = threading.Lock()
+
+  @property
+  def url(self) -> str:
+    return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+  # puzzles go out in order, wrapping around at the end
+  def next_puzzle(self, game : Optional[int] = None) -> Dict:
+    with self.lock:
+      if game is None:
+        game = self.served
+        self.served += 1
+    return self.puzzles[game % len(self.puzzles)]
+
+
+# play games on the stand-in page through waffle.py and time each of them end to end
+def play(url : str, games : int, sessions : int, ingest : str = 'dom') -> None:
+  def timed_game(driver : WebDriver) -> Optional[float]:
+    start = time.perf_counter()
+    solved = play_game(driver, ingest)
+    return time.perf_counter() - start if solved else None
+
+  start = time.perf_counter()
+  with SessionPool(min(sessions, games), url) as pool:
+    pool.warm()
+    warm = time.perf_counter() - start
+    start = time.perf_counter()
+    seconds = pool.run(games, timed_game)
+  elapsed = time.perf_counter() - start
+
+  solved = [s for s in seconds if s is not None]
+  print('Started {} sessions in {:.3f}s'.format(min(sessions, games), warm), file=sys.stderr)
+  print('Solved {} of {} games in {:.3f}s, {:.2f} games/sec'.format(len(solved), games, elapsed, games / elapsed), file=sys.stderr)
+  if solved:
+    print('Per game: median {:.3f}s, max {:.3f}s'.format(statistics.median(solved), max(solved)), file=sys.stderr)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description='Serve a local stand-in of the waffle game page')
+  parser.add_argument('puzzles', nargs='*', default=['waffle_override.json'], help='.json puzzle files or .jsonl files of puzzles')
+  parser.add_argument('--port', type=int, default=STAGE_PORT)
+  parser.add_argument('--swap-ms', type=int, default=SWAP_MS, help='how long a swap takes to animate')
+  parser.add_argument('--play', type=int, default=0, help='play this many games on the page, then stop')
+  parser.add_argument('-s', '--sessions', type=int, default=1, help='browsers playing at once')
+  parser.add_argument('--ingest', choices=['dom', 'state'], default='dom', help="read the tiles, or the game's stored state")
+  parser.add_argument('--metrics-json', default=None, help="write the played games' timings, counts and peaks here as json")
+  parser.add_argument('--metrics-prom', default=None, help='and here as a Prometheus textfile')
+  args = parser.parse_args()
+
+  server = StageServer(read_puzzles(args.puzzles), args.port, args.swap_ms)
+  print('Serving {} puzzles on {}'.format(len(server.puzzles), server.url), file=sys.stderr)
+  if not args.play:
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    server.server_close()
+    return
+
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  play(server.url, args.play, args.sessions, args.ingest)
+  metrics.write(args.metrics_json, args.metrics_prom)
+  server.shutdown()
+  server.server_close()
+
+
+if __name__ == '__main__':
+  main()
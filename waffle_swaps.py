@@ -0,0 +1,238 @@
+# Swap planning, turn the scrambled waffle into the solved waffle in the fewest swaps
+#
+# Every tile that is in the wrong space needs some letter and holds another. Think of it
+# as an edge from the letter a space needs to the letter it holds; the mismatched tiles
+# then form a graph where every letter has as many edges in as out, so the edges split
+# into cycles. A cycle of k tiles takes k - 1 swaps, so the fewest swaps is
+# (misplaced tiles) - (most cycles the edges can be split into)
+#
+# Without duplicate letters there's only one way to split the edges. With duplicates the
+# split is a choice, which we search for with memoization on the remaining edges
+#
+# SwapSearch is an A* search over boards to cross check the planner, with a transposition
+# table so a board reached by different swap orders is only expanded once. It's bounded
+# by a node and state limit so it can't run away on adversarial boards
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+Edge = Tuple[str, str]
+Swap = Tuple[int, int]
+
+
+# most cycles the edges can be split into, each cycle as the list of letters it visits
+def max_cycles(counts : Dict[Edge, int]) -> List[List[str]]:
+  counts = dict(counts)
+  cycles : List[List[str]] = []
+
+  # taking a 2-cycle (a needs b, b needs a) is never worse than any other choice
+  for (a, b), count in counts.items():
+    if a < b and (b, a) in counts:
+      pairs = min(count, counts[(b, a)])
+      cycles.extend([[a, b]] * pairs)
+      counts[(a, b)] -= pairs
+      counts[(b, a)] -= pairs
+
+  memo : Dict[Tuple[Tuple[Edge, int], ...], List[List[str]]] = {}
+  remaining = tuple(sorted((edge, count) for edge, count in counts.items() if count))
+  return cycles + best_split(remaining, memo)
+
+
+def best_split(remaining : Tuple[Tuple[Edge, int], ...], memo : Dict) -> List[List[str]]:
+  if not remaining:
+    return []
+  if remaining in memo:
+    return memo[remaining]
+
+  counts = dict(remaining)
+  out_edges : Dict[str, List[str]] = {}
+  for a, b in counts:
+    if a not in out_edges:
+      out_edges[a] = []
+    out_edges[a].append(b)
+
+  # the first edge has to be in some cycle, try every simple cycle through it
+  start, first = remaining[0][0]
+  best : Optional[List[List[str]]] = None
+  path = [start, first]
+  for cycle in simple_cycles(start, path, out_edges):
+    for edge in zip(cycle, cycle[1:] + cycle[:1]):
+      counts[edge] -= 1
+    rest = tuple((edge, count) for edge, count in sorted(counts.items()) if count)
+    split = [cycle] + best_split(rest, memo)
+    for edge in zip(cycle, cycle[1:] + cycle[:1]):
+      counts[edge] += 1
+    if best is None or len(split) > len(best):
+      best = split
+
+  assert(best is not None)
+  memo[remaining] = best
+  return best
+
+
+def simple_cycles(start : str, path : List[str], out_edges : Dict[str, List[str]]):
+  for letter in out_edges.get(path[-1], []):
+    if letter == start:
+      yield path[:]
+    elif letter not in path:
+      path.append(letter)
+      yield from simple_cycles(start, path, out_edges)
+      path.pop()
+
+
+# spaces still to fix, grouped by (letter needed, letter held)
+def misplaced_spaces(current : List[Optional[str]], correct : List[Optional[str]]) -> Dict[Edge, List[int]]:
+  spaces : Dict[Edge, List[int]] = {}
+  for i, (held, needed) in enumerate(zip(current, correct)):
+    if held is None or held == needed:
+      continue
+    if (needed, held) not in spaces:
+      spaces[(needed, held)] = []
+    spaces[(needed, held)].append(i)
+  return spaces
+
+
+# just the number of swaps plan_swaps would make
+def min_swaps(current : List[Optional[str]], correct : List[Optional[str]]) -> int:
+  counts = {edge: len(indexes) for edge, indexes in misplaced_spaces(current, correct).items()}
+  return sum(counts.values()) - len(max_cycles(counts))
+
+
+def plan_swaps(current : List[Optional[str]], correct : List[Optional[str]]) -> List[Swap]:
+  spaces = misplaced_spaces(current, correct)
+  counts = {edge: len(indexes) for edge, indexes in spaces.items()}
+  swaps : List[Swap] = []
+  for cycle in max_cycles(counts):
+    # the space needing cycle[0] holds cycle[1], the one needing cycle[1] holds cycle[2]...
+    indexes = [spaces[edge].pop() for edge in zip(cycle, cycle[1:] + cycle[:1])]
+    # keep sending the tile in the first space to where it belongs, the last one sent fixes it too
+    for index in indexes[1:]:
+      swaps.append((min(indexes[0], index), max(indexes[0], index)))
+  return swaps
+
+
+def apply_swaps(board : List[Optional[str]], swaps : List[Swap]) -> List[Optional[str]]:
+  board = board[:]
+  for i, j in swaps:
+    board[i], board[j] = board[j], board[i]
+  return board
+
+
+class SwapSearch():
+  def __init__(self, correct : List[Optional[str]], max_nodes : int = 200000, max_states : int = 1000000) -> None:
+    # boards are packed as bytes of the letters in the tile spaces only, skipping the holes
+    self.spaces = [i for i, letter in enumerate(correct) if letter is not None]
+    self.correct = pack(correct)
+    # limits on boards expanded and boards held in the open queue plus transposition table
+    self.max_nodes = max_nodes
+    self.max_states = max_states
+    self.nodes = 0
+    self.states = 0
+    # most boards the open queue held at once
+    self.max_queue = 0
+    self.limit_hit : Optional[str] = None
+
+  # bitmask of the tiles that aren't in their place yet
+  def misplaced_mask(self, board : bytes) -> int:
+    mask = 0
+    for i, (letter, correct) in enumerate(zip(board, self.correct)):
+      if letter != correct:
+        mask |= 1 << i
+    return mask
+
+  # lower bound on the swaps left. Every swap fixes at most two tiles, so misplaced / 2 never
+  # overestimates. Tighter: only 2-cycles fix two tiles in one swap, every other cycle needs
+  # at least 3 tiles, so with m misplaced tiles and at most p 2-cycles there are at most
+  # p + (m - 2p) / 3 cycles, and that bound is never below misplaced / 2
+  def heuristic(self, board : bytes, mask : int) -> int:
+    counts : Dict[int, int] = {}
+    misplaced = 0
+    for i in bits(mask):
+      edge = self.correct[i] << 8 | board[i]
+      counts[edge] = counts.get(edge, 0) + 1
+      misplaced += 1
+    pairs = 0
+    for edge, count in counts.items():
+      a, b = edge >> 8, edge & 0xff
+      if a < b:
+        pairs += min(count, counts.get(b << 8 | a, 0))
+    return misplaced - pairs - (misplaced - 2 * pairs) // 3
+
+  def search(self, current : List[Optional[str]]) -> Optional[List[Swap]]:
+    start = pack(current)
+    self.nodes = 0
+    self.max_queue = 0
+    self.limit_hit = None
+
+    # cheapest number of swaps seen to reach each board, and the board it was reached from
+    best_cost : Dict[bytes, int] = {start: 0}
+    parents : Dict[bytes, Optional[bytes]] = {start: None}
+    # ties on f go to the deeper board, counter keeps the heap from comparing boards
+    start_mask = self.misplaced_mask(start)
+    queue = [(self.heuristic(start, start_mask), 0, 0, start, start_mask)]
+    counter = 1
+    while queue:
+      _, neg_cost, _, board, mask = heapq.heappop(queue)
+      cost = -neg_cost
+      if cost > best_cost[board]:
+        continue
+
+      if not mask:
+        self.states = len(best_cost) + len(queue)
+        return self.path(board, parents)
+
+      self.nodes += 1
+      if self.nodes > self.max_nodes:
+        self.limit_hit = 'nodes'
+        break
+
+      # only try swaps that put at least one of the two tiles in its place
+      misplaced = list(bits(mask))
+      for a, i in enumerate(misplaced):
+        for j in misplaced[a + 1:]:
+          if board[i] == board[j] or (board[i] != self.correct[j] and board[j] != self.correct[i]):
+            continue
+          child = bytearray(board)
+          child[i], child[j] = child[j], child[i]
+          child_board = bytes(child)
+          if best_cost.get(child_board, cost + 2) <= cost + 1:
+            continue
+          child_mask = mask
+          if child[i] == self.correct[i]:
+            child_mask &= ~(1 << i)
+          if child[j] == self.correct[j]:
+            child_mask &= ~(1 << j)
+          best_cost[child_board] = cost + 1
+          parents[child_board] = board
+          heapq.heappush(queue, (cost + 1 + self.heuristic(child_board, child_mask), -(cost + 1), counter, child_board, child_mask))
+          counter += 1
+
+      self.max_queue = max(self.max_queue, len(queue))
+      if len(best_cost) + len(queue) > self.max_states:
+        self.limit_hit = 'states'
+        break
+
+    self.states = len(best_cost) + len(queue)
+    return None
+
+  # walk the parent pointers back to the start, each step differs from its parent by one swap
+  def path(self, board : bytes, parents : Dict[bytes, Optional[bytes]]) -> List[Swap]:
+    swaps : List[Swap] = []
+    parent = parents[board]
+    while parent is not None:
+      i, j = [k for k in range(len(board)) if board[k] != parent[k]]
+      swaps.append((self.spaces[i], self.spaces[j]))
+      board, parent = parent, parents[parent]
+    swaps.reverse()
+    return swaps
+
+
+def pack(board : List[Optional[str]]) -> bytes:
+  return ''.join(letter for letter in board if letter is not None).encode('ascii')
+
+
+def bits(mask : int):
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask ^= low
@@ -0,0 +1,250 @@
+# Dictionary of five letter words encoded as a numpy matrix
+# Candidate words for every slot of the waffle are filtered with boolean masks
+# over the whole dictionary at once instead of letter by letter
+#
+# The encoded dictionary and its lookup tables are compiled once into a binary
+# artifact next to the word list, which is memory mapped read-only so every
+# process using it shares the same pages
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+WORD_LENGTH = 5
+NUM_LETTERS = 26
+
+WORDS_PATH = 'words.txt'
+ARTIFACT_SUFFIX = '.bin'
+ARTIFACT_MAGIC = b'WAFFLEDB'
+# bump whenever the layout of the artifact changes so stale artifacts get rebuilt
+ARTIFACT_VERSION = 1
+ARTIFACT_ALIGN = 64
+
+# possible letters for each position of a slot, the letters known to be in it (once per
+# copy) and the most copies of a letter it can have
+SlotConstraint = Tuple[List[Set[str]], List[str], Dict[str, int]]
+
+'''
+Lookup tables are stored CSR style: the ids of all words sorted by a key, plus
+an offsets array where the words with key k are ids[offsets[k]:offsets[k + 1]]
+
+  position:         key = position * 26 + letter
+  first_middle_end: key = first * 26 * 26 + middle * 26 + last
+
+Since first_middle_end is sorted by first letter, then middle letter, the words
+for a (first, middle) pair or a first letter alone are contiguous runs of it
+'''
+
+
+def letter_mask(letters : Set[str]) -> np.ndarray:
+  mask = np.zeros(NUM_LETTERS, dtype=bool)
+  for letter in letters:
+    mask[ord(letter) - ord('A')] = True
+  return mask
+
+
+def build_csr(keys : np.ndarray, num_keys : int) -> Tuple[np.ndarray, np.ndarray]:
+  ids = np.argsort(keys, kind='stable').astype(np.int32)
+  offsets = np.zeros(num_keys + 1, dtype=np.int32)
+  np.cumsum(np.bincount(keys, minlength=num_keys), out=offsets[1:])
+  return ids, offsets
+
+
+class WordMatrix():
+  def __init__(self, arrays : Dict[str, np.ndarray]) -> None:
+    # letters[i][j] is the j-th letter of word i as 0-25
+    self.letters = arrays['letters']
+    # counts[i][c] is how many times letter c is in word i
+    self.counts = arrays['counts']
+    self.position_ids = arrays['position_ids']
+    self.position_offsets = arrays['position_offsets']
+    self.first_middle_end_ids = arrays['first_middle_end_ids']
+    self.first_middle_end_offsets = arrays['first_middle_end_offsets']
+    text = (self.letters + ord('A')).astype(np.uint8).tobytes().decode('ascii')
+    self.words = [text[i:i + WORD_LENGTH] for i in range(0, len(text), WORD_LENGTH)]
+
+  def __len__(self) -> int:
+    return len(self.words)
+
+  # ids of the words with this letter (0-25) in this position
+  def position(self, pos : int, letter : int) -> np.ndarray:
+    key = pos * NUM_LETTERS + letter
+    return self.position_ids[self.position_offsets[key]:self.position_offsets[key + 1]]
+
+  # boolean mask over the dictionary for each slot, filtered all in one go
+  def filter_masks(self, slots : List[SlotConstraint]) -> np.ndarray:
+    allowed = np.zeros((len(slots), WORD_LENGTH, NUM_LETTERS), dtype=bool)
+    at_least = np.zeros((len(slots), NUM_LETTERS), dtype=np.uint8)
+    at_most = np.full((len(slots), NUM_LETTERS), WORD_LENGTH, dtype=np.uint8)
+    for s, (possible_letters, known_letters, max_letters) in enumerate(slots):
+      for pos, letters in enumerate(possible_letters):
+        allowed[s, pos] = letter_mask(letters)
+      for letter in known_letters:
+        at_least[s, ord(letter) - ord('A')] += 1
+      for letter, count in max_letters.items():
+        at_most[s, ord(letter) - ord('A')] = count
+
+    # make sure all letters in the word satisfy the positional constraints
+    positions = np.arange(WORD_LENGTH)[None, :]
+    masks = allowed[:, positions, self.letters].all(axis=2)
+
+    # make sure for-sure letters are in the word as many times as we know of, and no more than allowed
+    # only letters some slot has a count for need checking
+    letters = np.flatnonzero((at_least > 0).any(axis=0) | (at_most < WORD_LENGTH).any(axis=0))
+    counts = self.counts[None, :, letters]
+    masks &= ((counts >= at_least[:, None, letters]) & (counts <= at_most[:, None, letters])).all(axis=2)
+    return masks
+
+  def filter_slots(self, slots : List[SlotConstraint]) -> List[List[str]]:
+    masks = self.filter_masks(slots)
+    return [[self.words[i] for i in np.flatnonzero(mask)] for mask in masks]
+
+
+def read_words(path : str = WORDS_PATH) -> List[str]:
+  with open(path) as f:
+    return sorted(set(word.strip().upper() for word in f.readlines() if word.strip()))
+
+
+def encode_words(words : List[str]) -> Dict[str, np.ndarray]:
+  words = sorted(set(words))
+  letters = np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8).reshape(-1, WORD_LENGTH) - ord('A')
+  counts = np.zeros((len(words), NUM_LETTERS), dtype=np.uint8)
+  for pos in range(WORD_LENGTH):
+    np.add.at(counts, (np.arange(len(words)), letters[:, pos]), 1)
+
+  keys = (np.arange(WORD_LENGTH)[None, :] * NUM_LETTERS + letters).T.ravel()
+  position_ids, position_offsets = build_csr(keys, WORD_LENGTH * NUM_LETTERS)
+  # keys are laid out position by position, so turn the flat index back into a word id
+  position_ids %= len(words)
+
+  fme_keys = (letters[:, 0].astype(np.int32) * NUM_LETTERS + letters[:, 2]) * NUM_LETTERS + letters[:, -1]
+  first_middle_end_ids, first_middle_end_offsets = build_csr(fme_keys, NUM_LETTERS ** 3)
+
+  return {
+    'letters': letters,
+    'counts': counts,
+    'position_ids': position_ids,
+    'position_offsets': position_offsets,
+    'first_middle_end_ids': first_middle_end_ids,
+    'first_middle_end_offsets': first_middle_end_offsets,
+  }
+
+
+def source_digest(path : str) -> str:
+  with open(path, 'rb') as f:
+    return hashlib.sha1(f.read()).hexdigest()
+
+
+'''
+Artifact layout:
+
+  8 bytes   magic
+  4 bytes   version (little endian uint32)
+  4 bytes   length of the json header (little endian uint32)
+  header    json with the source digest and the offset, dtype and shape of every array
+  arrays    raw array data, each aligned to 64 bytes
+'''
+
+# where the data starts after a header of this many bytes
+def artifact_data_start(header_length : int) -> int:
+  return -(-(16 + header_length) // ARTIFACT_ALIGN) * ARTIFACT_ALIGN
+
+
+# a new empty file next to path to write it under before renaming it into place. Unique to every
+# writer, threads and processes compiling the same artifact at once each get their own
+def temp_path(path : str) -> str:
+  fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path) or '.')
+  os.close(fd)
+  # mkstemp makes the file private, keep the artifact readable like any other file
+  os.chmod(tmp_path, 0o644)
+  return tmp_path
+
+
+# write arrays and a json header in the artifact layout, returns the path
+def write_artifact(path : str, arrays : Dict[str, np.ndarray], header : dict, magic : bytes = ARTIFACT_MAGIC, version : int = ARTIFACT_VERSION) -> str:
+  header = dict(header, arrays={})
+  # offsets are relative to the end of the header, which depends on the header size itself
+  offset = 0
+  for name, array in arrays.items():
+    offset = -(-offset // ARTIFACT_ALIGN) * ARTIFACT_ALIGN
+    header['arrays'][name] = [offset, array.dtype.str, list(array.shape)]
+    offset += array.nbytes
+  header_bytes = json.dumps(header).encode('utf-8')
+  data_start = artifact_data_start(len(header_bytes))
+
+  # write to a temporary file and rename, so readers never see a half written artifact
+  tmp_path = temp_path(path)
+  with open(tmp_path, 'wb') as f:
+    f.write(magic + struct.pack('<II', version, len(header_bytes)) + header_bytes)
+    for name, array in arrays.items():
+      f.seek(data_start + header['arrays'][name][0])
+      f.write(np.ascontiguousarray(array).tobytes())
+  os.replace(tmp_path, path)
+  return path
+
+
+def compile_dictionary(words_path : str = WORDS_PATH, artifact_path : Optional[str] = None) -> str:
+  artifact_path = artifact_path or words_path + ARTIFACT_SUFFIX
+  stat = os.stat(words_path)
+  header = {
+    'source_digest': source_digest(words_path),
+    'source_size': stat.st_size,
+    'source_mtime_ns': stat.st_mtime_ns,
+  }
+  return write_artifact(artifact_path, encode_words(read_words(words_path)), header)
+
+
+def read_artifact_header(artifact_path : str, magic : bytes = ARTIFACT_MAGIC, version : int = ARTIFACT_VERSION) -> Optional[Tuple[dict, int]]:
+  try:
+    with open(artifact_path, 'rb') as f:
+      prefix = f.read(16)
+      if len(prefix) != 16 or prefix[:8] != magic:
+        return None
+      file_version, header_length = struct.unpack('<II', prefix[8:])
+      if file_version != version:
+        return None
+      header = json.loads(f.read(header_length).decode('utf-8'))
+  except OSError:
+    return None
+  return header, artifact_data_start(header_length)
+
+
+# map every array of an artifact read-only
+def map_artifact(artifact_path : str, header : dict, data_start : int) -> Dict[str, np.ndarray]:
+  with open(artifact_path, 'rb') as f:
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+  arrays : Dict[str, np.ndarray] = {}
+  for name, (offset, dtype, shape) in header['arrays'].items():
+    count = int(np.prod(shape))
+    arrays[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=data_start + offset).reshape(shape)
+  return arrays
+
+
+def is_stale(header : dict, words_path : str) -> bool:
+  stat = os.stat(words_path)
+  if stat.st_size == header['source_size'] and stat.st_mtime_ns == header['source_mtime_ns']:
+    return False
+  # the file was touched, only rebuild if the words actually changed
+  return source_digest(words_path) != header['source_digest']
+
+
+# map the compiled dictionary read-only, compiling it first if it's missing or out of date
+def load_word_matrix(words_path : str = WORDS_PATH, artifact_path : Optional[str] = None) -> WordMatrix:
+  artifact_path = artifact_path or words_path + ARTIFACT_SUFFIX
+  result = read_artifact_header(artifact_path)
+  if result is None or is_stale(result[0], words_path):
+    compile_dictionary(words_path, artifact_path)
+    result = read_artifact_header(artifact_path)
+    assert(result is not None)
+  header, data_start = result
+  return WordMatrix(map_artifact(artifact_path, header, data_start))
+
+
+if __name__ == '__main__':
+  print('Compiled dictionary to', compile_dictionary())